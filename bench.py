@@ -0,0 +1,172 @@
+# --- Micro-benchmarks for the game cores ---
+# Usage: python bench.py c4 [--games N]
+#        python bench.py persist [--games N] [--seconds S]
+#        python bench.py startup [--runs N]
+#        python bench.py hangman [--words N] [--games N] [--verify STATES]
+import argparse
+import asyncio
+import collections
+import json
+import math
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import random
+import time
+import numpy as np
+import bot
+
+# --- Connect Four: legacy NumPy board, kept here only as the baseline ---
+def legacy_c4_play(cols):
+    b, pieces = np.full((bot.C4_ROWS, bot.C4_COLS), bot.C4_EMPTY), (bot.C4_P1, bot.C4_P2)
+    for n, c in enumerate(cols):
+        if b[0][c] != bot.C4_EMPTY: return
+        r = next(r for r in range(bot.C4_ROWS - 1, -1, -1) if b[r][c] == bot.C4_EMPTY)
+        p = pieces[n & 1]; b[r][c] = p
+        if legacy_c4_check_win(b, p) or bot.C4_EMPTY not in b: return
+def legacy_c4_check_win(b, p):
+    for c in range(bot.C4_COLS - 3):
+        for r in range(bot.C4_ROWS):
+            if all(b[r][c+i] == p for i in range(4)): return True
+    for c in range(bot.C4_COLS):
+        for r in range(bot.C4_ROWS - 3):
+            if all(b[r+i][c] == p for i in range(4)): return True
+    for c in range(bot.C4_COLS - 3):
+        for r in range(bot.C4_ROWS - 3):
+            if all(b[r+i][c+i] == p for i in range(4)): return True
+    for c in range(bot.C4_COLS - 3):
+        for r in range(3, bot.C4_ROWS):
+            if all(b[r-i][c+i] == p for i in range(4)): return True
+    return False
+def bitboard_c4_play(cols):
+    b = bot.c4_create_board()
+    for c in cols:
+        if not b.can_play(c) or b.play(c) or b.is_full(): return
+def random_c4_games(n, seed=0):
+    rng, games = random.Random(seed), []
+    for _ in range(n):
+        b, cols = bot.c4_create_board(), []
+        while True:
+            c = rng.choice([c for c in range(bot.C4_COLS) if b.can_play(c)]); cols.append(c)
+            if b.play(c) or b.is_full(): break
+        games.append(cols)
+    return games
+def bench_c4(args):
+    games = random_c4_games(args.games); moves = sum(map(len, games))
+    for name, play in (("numpy", legacy_c4_play), ("bitboard", bitboard_c4_play)):
+        t = time.perf_counter()
+        for cols in games: play(cols)
+        dt = time.perf_counter() - t
+        print(f"c4 {name:>9}: {moves} moves in {dt:.3f}s -> {moves / dt:,.0f} moves/sec")
+
+# --- Persistence: sustained moves/sec through the session registry with and without the store ---
+async def persist_run(store, games, seconds):
+    reg = bot.SessionRegistry(capacity=games * 2, per_user=games, per_guild=games * 2); reg.store = store
+    for g in range(games): reg.add("hangman", g, {"word": "PUZZLE", "guessed": set(), "wrong_guesses": 0, "player": g}, [g], g % 50)
+    task = asyncio.create_task(store.run()) if store else None
+    moves, letters, end = 0, "ABCDEFGHIJKLMNOPQRSTUVWXY", time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        for g in range(games):
+            gs = reg.get(g); l = letters[moves % 25]; gs["guessed"].add(l)
+            if l not in gs["word"]: gs["wrong_guesses"] += 1
+            moves += 1
+        await asyncio.sleep(0)
+    if task: task.cancel(); await store.flush()
+    return moves / (time.perf_counter() - end + seconds)
+def bench_persist(args):
+    rate = asyncio.run(persist_run(None, args.games, args.seconds))
+    print(f"persist  disabled: {rate:,.0f} moves/sec")
+    with tempfile.TemporaryDirectory() as d:
+        store = bot.GameStore(os.path.join(d, "bench.db"), flush_interval=args.flush).open()
+        rate = asyncio.run(persist_run(store, args.games, args.seconds)); m = store.metrics
+        print(f"persist   enabled: {rate:,.0f} moves/sec ({m['batches']} batches, {m['rows']} rows written, {m['coalesced']} writes coalesced)")
+        store.close()
+
+# --- Startup: fresh interpreter to first handled interaction, with a cold and a warm .cache ---
+# The child imports the bot, hashes the command tree the way the startup sync does, and runs one
+# /hangman through the headless harness; times are wall-clock from just before the spawn.
+STARTUP_CHILD = """
+import json, sys, time
+sys.argv = ["harness"]
+import asyncio, harness, bot
+imported = time.time()
+t = time.time(); bot.command_hashes(); manifest = time.time() - t
+asyncio.run(harness.Harness().command("hangman", bot.hangman, harness.FakeUser(2), 1, 1))
+print(json.dumps({"imported": imported, "manifest": manifest, "handled": time.time(), "in_process": bot.metrics.cold_start}))
+"""
+def startup_run(cache_dir):
+    env = {**os.environ, "PUZZLES_DB": "", "PUZZLES_CACHE_DIR": cache_dir}
+    t = time.time(); out = subprocess.run([sys.executable, "-c", STARTUP_CHILD], env=env, cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True)
+    r = json.loads(out.stdout.splitlines()[-1])
+    return r["imported"] - t, r["handled"] - t, r["manifest"], r["in_process"]
+def bench_startup(args):
+    with tempfile.TemporaryDirectory() as warm:
+        startup_run(warm)
+        for name in ("cold", "warm"):
+            runs = []
+            for _ in range(args.runs):
+                with tempfile.TemporaryDirectory() as cold: runs.append(startup_run(cold if name == "cold" else warm))
+            imported, handled, manifest, in_process = (statistics.median(x) * 1000 for x in zip(*runs))
+            print(f"startup {name:>5}: import {imported:.0f}ms, first interaction {handled:.0f}ms ({in_process:.0f}ms after bot.py started), command manifest {manifest:.1f}ms (median of {args.runs})")
+
+# --- Hangman: hint and adversarial dodge latency on a large synthetic dictionary ---
+# Words are random strings with English letter frequencies, which split less evenly than real
+# words, so this is a pessimistic load. Every game state is new, so each call misses the caches.
+LETTER_FREQ = {"E": 12, "T": 9, "A": 8, "O": 7.5, "I": 7, "N": 6.7, "S": 6.3, "H": 6, "R": 6, "D": 4.2, "L": 4, "C": 2.8, "U": 2.8, "M": 2.4, "W": 2.4,
+               "F": 2.2, "G": 2, "Y": 2, "P": 1.9, "B": 1.5, "V": 1, "K": 0.8, "J": 0.15, "X": 0.15, "Q": 0.1, "Z": 0.07}
+# --verify replays random game states through a plain scan of the word list and requires the
+# indexed functions to agree exactly (entropies to float rounding).
+def brute_candidates(ws, pattern, excluded):
+    guessed = set(pattern.replace("_", "") + excluded)
+    return [k for k, w in enumerate(ws) if all(c == p if p != "_" else c not in guessed for c, p in zip(w, pattern))]
+def brute_outcomes(ws, idx):
+    return collections.Counter((c, tuple(p for p, x in enumerate(ws[k]) if x == c)) for k in idx for c in map(chr, range(65, 91)))
+def verify_hangman(rng, states):
+    part = bot.words.part("hangman"); pool = list(part["scores"])
+    for n in range(states):
+        word = rng.choice(pool); guessed = set(rng.sample(part["letters"], rng.choice([0, 1, 2, 3, 4, 6, 9])))
+        pattern, excluded = bot.hm_state_key(word, guessed); ws = part["lengths"][len(word)]["words"]
+        idx = brute_candidates(ws, pattern, excluded); outcomes = brute_outcomes(ws, idx)
+        assert bot.hm_candidates(pattern, excluded).tolist() == idx, f"candidates differ for {pattern} -{excluded}"
+        counts, entropy = bot.hm_letter_stats(pattern, excluded)
+        for l, c in enumerate(map(chr, range(65, 91))):
+            sizes = [m for (x, _), m in outcomes.items() if x == c]
+            assert counts[l] == len(idx) - outcomes.get((c, ()), 0), f"count of {c} differs for {pattern} -{excluded}"
+            assert abs(entropy[l] - (math.log2(len(idx)) - sum(m * math.log2(m) for m in sizes) / len(idx))) < 1e-9, f"entropy of {c} differs for {pattern} -{excluded}"
+        letter = rng.choice([c for c in part["letters"] if c not in guessed]); seed = rng.random()
+        groups = sorted((sum(1 << p for p in ps), m) for (x, ps), m in outcomes.items() if x == letter)
+        mask = max(groups, key=lambda g: (g[1], g[0] == 0))[0]
+        group = [k for k in idx if sum(1 << p for p, x in enumerate(ws[k]) if x == letter) == mask]
+        random.seed(seed); expected = ws[random.choice(group)]; random.seed(seed)
+        assert bot.hm_dodge(word, guessed, letter) == expected, f"dodge on {letter} differs for {pattern} -{excluded}"
+    print(f"hangman verify: {states} random states match a full scan")
+def bench_hangman(args):
+    rng, ws = random.Random(0), set()
+    while len(ws) < args.words: ws.add("".join(rng.choices(list(LETTER_FREQ), list(LETTER_FREQ.values()), k=rng.randint(4, 12))))
+    with tempfile.TemporaryDirectory() as d:
+        with open(os.path.join(d, "words.json"), "w") as f: json.dump({"hangman_words": sorted(ws)}, f)
+        t = time.perf_counter(); bot.words = bot.WordBank(os.path.join(d, "words.json"), d).warm(["hangman"])
+        print(f"hangman index: {len(ws):,} words compiled in {time.perf_counter() - t:.1f}s")
+    if args.verify: verify_hangman(random.Random(1), args.verify)
+    bot.hm_candidates.cache_clear(); bot.hm_outcomes.cache_clear(); bot.hm_letter_stats.cache_clear()
+    part = bot.words.part("hangman"); pool, times = list(part["scores"]), {"hint": [], "dodge": []}
+    for g in range(args.games):
+        word, guessed = rng.choice(pool), set()
+        while any(c not in guessed for c in word):
+            t = time.perf_counter(); best, _, _ = bot.hm_hint(word, guessed); times["hint"].append(time.perf_counter() - t)
+            letter = best if rng.random() < 0.5 else rng.choice([c for c in part["letters"] if c not in guessed])
+            t = time.perf_counter(); word = bot.hm_dodge(word, guessed, letter); times["dodge"].append(time.perf_counter() - t)
+            guessed.add(letter)
+    for name, ts in times.items():
+        ts.sort(); print(f"hangman {name:>5}: median {ts[len(ts) // 2] * 1e6:.0f}us, p90 {ts[len(ts) * 9 // 10] * 1e6:.0f}us, p99 {ts[len(ts) * 99 // 100] * 1e6:.0f}us ({len(ts)} calls)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PuzzlesBot micro-benchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+    c4 = sub.add_parser("c4", help="Connect Four moves/sec: NumPy board vs bitboard"); c4.add_argument("--games", type=int, default=500); c4.set_defaults(func=bench_c4)
+    persist = sub.add_parser("persist", help="Moves/sec with the SQLite write-behind store enabled vs disabled"); persist.add_argument("--games", type=int, default=1000); persist.add_argument("--seconds", type=float, default=3.0); persist.add_argument("--flush", type=float, default=bot.DB_FLUSH_INTERVAL); persist.set_defaults(func=bench_persist)
+    hangman = sub.add_parser("hangman", help="Hangman hint/dodge latency on a synthetic dictionary"); hangman.add_argument("--words", type=int, default=200000); hangman.add_argument("--games", type=int, default=300); hangman.add_argument("--verify", type=int, default=0, metavar="STATES", help="first check this many random states against a full scan"); hangman.set_defaults(func=bench_hangman)
+    startup = sub.add_parser("startup", help="Cold-start time to the first handled interaction"); startup.add_argument("--runs", type=int, default=5); startup.set_defaults(func=bench_startup)
+    args = parser.parse_args(); args.func(args)
@@ -1,151 +1,943 @@
+import time
+BOOT = time.perf_counter() # before the imports below, so cold start includes loading discord.py and numpy
 import os
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord import app_commands
 from dotenv import load_dotenv
-import numpy as np
 import random
 import json
 import aiohttp
 import html
+import functools
+import asyncio
+import concurrent.futures
+import sys
+import collections
+import sqlite3
+import threading
+import logging
+import hashlib
+import pickle
+import bisect
+import io
+import aiohttp.web
+import signal
+import numpy as np
 
 # --- Bot Setup ---
 load_dotenv()
 TOKEN = os.getenv('DISCORD_BOT_TOKEN')
-intents = discord.Intents.all()
-bot = commands.Bot(command_prefix="!", intents=intents)
+# Games only need slash commands and components, whose payloads carry the user and member data,
+# so the guild list is the only gateway state we subscribe to and nothing else is cached.
+intents = discord.Intents(guilds=True)
+# Sharded deployments (see supervisor.py) run one worker process per slice of shards. Discord
+# routes a guild's interactions to shard (guild_id >> 22) % shard_count and DMs to shard 0, so each
+# worker owns the games of its guilds and never has to look at another process's sessions.
+# Process-wide admin actions go through the supervisor: SIGHUP to it reloads words in every worker.
+SHARD_COUNT = int(os.getenv("PUZZLES_SHARD_COUNT", "0")) or None
+SHARD_IDS = [int(s) for s in os.getenv("PUZZLES_SHARD_IDS", "").split(",") if s.strip()] or None
+WORKER = int(os.getenv("PUZZLES_WORKER", "0"))
+SUPERVISOR_PID = int(os.getenv("PUZZLES_SUPERVISOR_PID", "0")) or None
+if SHARD_IDS and (not SHARD_COUNT or max(SHARD_IDS) >= SHARD_COUNT):
+    sys.exit(f"ERROR: PUZZLES_SHARD_IDS={','.join(map(str, SHARD_IDS))} needs PUZZLES_SHARD_COUNT set above the highest shard id.")
+def shard_for_guild(guild_id): return 0 if guild_id is None else (guild_id >> 22) % SHARD_COUNT
+def owns_guild(guild_id): return SHARD_IDS is None or shard_for_guild(guild_id) in SHARD_IDS
+class PuzzlesBot(commands.AutoShardedBot):
+    async def setup_hook(self):
+        self.add_dynamic_items(GameComponent); await metrics.start()
+        if os.name == "posix":
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, lambda: asyncio.create_task(self.close())) # flush games when the supervisor stops us
+            asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, lambda: asyncio.create_task(reload_words())) # /reloadwords in any worker, via the supervisor
+        if store:
+            store.open()
+            restored = sum(sessions.restore(game, gid, state, users, guild_id, expires_at) for gid, game, guild_id, users, state, expires_at in store.load() if owns_guild(guild_id))
+            sessions.store = store; print(f"Restored {restored} in-progress games from {store.path}")
+            # Clicks on restored games reach words.part() synchronously, so build what they need before connecting.
+            await asyncio.gather(*(words.load(p) for p in {GAME_WORD_PARTS[s.game] for s in sessions.sessions.values() if s.game in GAME_WORD_PARTS}))
+            for s in list(sessions.sessions.values()):
+                if s.game == "connectfour" and s.state.get("ai") and s.state["turn_index"] == 1: asyncio.create_task(c4_resume_ai(s.state))
+            self.store_task = asyncio.create_task(store.run())
+        if WORKER == 0: self.sync_task = asyncio.create_task(sync_commands())
+    async def close(self):
+        await metrics.stop()
+        if store and store.db:
+            self.store_task.cancel(); await store.flush(); store.close()
+        if _c4_pool: _c4_pool.shutdown(wait=False, cancel_futures=True)
+        await super().close()
+bot = PuzzlesBot(command_prefix=commands.when_mentioned, intents=intents, shard_ids=SHARD_IDS, shard_count=SHARD_COUNT, member_cache_flags=discord.MemberCacheFlags.none(), max_messages=None, max_ratelimit_timeout=10.0)
+
+# --- Metrics ---
+# Handlers and render helpers are wrapped with metrics.timed, which observes their wall time into
+# fixed-bucket histograms (a bisect and three adds per call). Everything else is read from the
+# registries when scraped: a Prometheus text endpoint on PUZZLES_METRICS_PORT and the /stats command.
+METRICS_HOST = os.getenv("PUZZLES_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("PUZZLES_METRICS_PORT", "0")) # 0 disables the HTTP endpoint
+LOOP_LAG_INTERVAL = float(os.getenv("PUZZLES_LOOP_LAG_INTERVAL", "0.25"))
+PROFILER_INTERVAL = float(os.getenv("PUZZLES_PROFILER_INTERVAL", "0.005"))
+LATENCY_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+HISTOGRAM_FAMILIES = {"command": ("puzzles_command_seconds", "command"), "component": ("puzzles_component_seconds", "game"), "modal": ("puzzles_modal_seconds", "modal"),
+                      "render": ("puzzles_render_seconds", "helper"), "loop": ("puzzles_loop_lag_seconds", None)}
+def prom_labels(labels): return "{" + ",".join(f'{k}={json.dumps(str(v))}' for k, v in labels.items()) + "}" if labels else ""
+class Histogram:
+    __slots__ = ("counts", "sum", "n", "max")
+    def __init__(self): self.counts, self.sum, self.n, self.max = [0] * (len(LATENCY_BUCKETS) + 1), 0.0, 0, 0.0
+    def observe(self, v):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, v)] += 1; self.sum += v; self.n += 1
+        if v > self.max: self.max = v
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation, capped at the largest one seen.
+        seen, rank = 0, q * self.n
+        for bound, c in zip(LATENCY_BUCKETS, self.counts):
+            seen += c
+            if c and seen >= rank: return min(bound, self.max)
+        return self.max
+class Metrics:
+    def __init__(self):
+        self.histograms = collections.defaultdict(Histogram)
+        self.errors, self.gateway = collections.Counter(), collections.Counter()
+        self.loop_lag, self.started, self.boot = 0.0, time.time(), BOOT
+        self.lag_task = self.runner = self.profiler = self.cold_start = None
+    def timed(self, family, name=None):
+        def wrap(f):
+            h, label = self.histograms[family, name or f.__name__], (family, name or f.__name__)
+            if asyncio.iscoroutinefunction(f):
+                @functools.wraps(f)
+                async def timed_call(*args, **kwargs):
+                    t = time.perf_counter()
+                    try: return await f(*args, **kwargs)
+                    except Exception: self.errors[label] += 1; raise
+                    finally:
+                        h.observe(time.perf_counter() - t)
+                        if self.cold_start is None: self.cold_start = time.perf_counter() - self.boot; print(f"First interaction handled {self.cold_start:.2f}s after startup")
+            else:
+                @functools.wraps(f)
+                def timed_call(*args, **kwargs):
+                    t = time.perf_counter()
+                    try: return f(*args, **kwargs)
+                    finally: h.observe(time.perf_counter() - t)
+            return timed_call
+        return wrap
+    async def sample_loop_lag(self, interval=LOOP_LAG_INTERVAL):
+        h = self.histograms["loop", None]
+        while True:
+            t = time.perf_counter(); await asyncio.sleep(interval)
+            self.loop_lag = max(0.0, time.perf_counter() - t - interval); h.observe(self.loop_lag)
+    def reconnects(self): return sum(max(0, c - 1) if event == "connect" else c for (event, shard), c in self.gateway.items() if event != "disconnect")
+    def render(self):
+        out = []
+        def family(name, kind, rows):
+            out.append(f"# TYPE {name} {kind}"); out.extend(f"{name}{prom_labels(labels)} {value}" for labels, value in rows)
+        by_family = collections.defaultdict(list)
+        for (fam, label), h in self.histograms.items(): by_family[fam].append((label, h))
+        for fam, items in by_family.items():
+            name, key = HISTOGRAM_FAMILIES[fam]; out.append(f"# TYPE {name} histogram")
+            for label, h in sorted(items, key=lambda item: item[0] or ""):
+                base, seen = {key: label} if key else {}, 0
+                for bound, c in zip(LATENCY_BUCKETS + ("+Inf",), h.counts): seen += c; out.append(f"{name}_bucket{prom_labels({**base, 'le': bound})} {seen}")
+                out += [f"{name}_sum{prom_labels(base)} {h.sum:.9f}", f"{name}_count{prom_labels(base)} {h.n}"]
+        family("puzzles_handler_errors_total", "counter", [({"kind": k, "name": n}, c) for (k, n), c in self.errors.items()])
+        family("puzzles_active_games", "gauge", [({"game": g}, c) for g, c in sessions.counts().items()])
+        family("puzzles_sessions_memory_bytes", "gauge", [({}, sessions.memory_bytes)])
+        for kind in ("started", "ended", "expired", "evicted"):
+            family(f"puzzles_games_{kind}_total", "counter", [({"game": g}, c) for g, c in getattr(sessions, kind).items()])
+        family("puzzles_gateway_events_total", "counter", [({"event": e, "shard": shard}, c) for (e, shard), c in self.gateway.items()])
+        family("puzzles_gateway_reconnects_total", "counter", [({}, self.reconnects())])
+        family("puzzles_gateway_latency_seconds", "gauge", [({"shard": shard}, f"{latency:.6f}") for shard, latency in bot.latencies if latency == latency])
+        family("puzzles_loop_lag_last_seconds", "gauge", [({}, f"{self.loop_lag:.6f}")])
+        family("puzzles_edit_queue_depth", "gauge", [({}, len(scheduler.pending))])
+        family("puzzles_edits_total", "counter", [({"result": k}, c) for k, c in scheduler.metrics.items()])
+        if store: family("puzzles_store_total", "counter", [({"op": k}, c) for k, c in store.metrics.items()])
+        family("puzzles_uptime_seconds", "gauge", [({}, f"{time.time() - self.started:.0f}")])
+        if self.cold_start is not None: family("puzzles_cold_start_seconds", "gauge", [({}, f"{self.cold_start:.3f}")])
+        return "\n".join(out) + "\n"
+    async def handle_scrape(self, request): return aiohttp.web.Response(text=self.render(), content_type="text/plain")
+    async def start(self, host=METRICS_HOST, port=METRICS_PORT):
+        self.lag_task = asyncio.create_task(self.sample_loop_lag())
+        if not port: return
+        app = aiohttp.web.Application(); app.router.add_get("/metrics", self.handle_scrape)
+        self.runner = aiohttp.web.AppRunner(app, access_log=None); await self.runner.setup()
+        await aiohttp.web.TCPSite(self.runner, host, port).start(); print(f"Serving metrics on http://{host}:{port}/metrics")
+    async def stop(self):
+        if self.lag_task: self.lag_task.cancel()
+        if self.runner: await self.runner.cleanup(); self.runner = None
+        if self.profiler: self.profiler.stop(); self.profiler = None
+metrics = Metrics()
+
+# Started and stopped at runtime with /profile. A daemon thread samples the event loop thread's
+# stack every PROFILER_INTERVAL seconds; nothing runs while it is stopped.
+class SamplingProfiler:
+    def __init__(self, thread_id, interval=PROFILER_INTERVAL):
+        self.thread_id, self.interval, self.stacks, self.samples = thread_id, interval, collections.Counter(), 0
+        self.halt, self.started = threading.Event(), time.monotonic()
+        self.thread = threading.Thread(target=self._run, name="puzzles-profiler", daemon=True)
+    def start(self): self.thread.start(); return self
+    def stop(self): self.halt.set(); self.thread.join(); return self
+    def _run(self):
+        while not self.halt.wait(self.interval):
+            frame, stack = sys._current_frames().get(self.thread_id), []
+            while frame is not None: stack.append(f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_firstlineno})"); frame = frame.f_back
+            if stack: self.stacks[tuple(reversed(stack))] += 1; self.samples += 1
+    def top(self, n=10):
+        own, total = collections.Counter(), collections.Counter()
+        for stack, c in self.stacks.items():
+            own[stack[-1]] += c
+            for f in set(stack): total[f] += c
+        return own.most_common(n), total.most_common(n)
+    def collapsed(self): return "\n".join(f"{';'.join(s)} {c}" for s, c in self.stacks.most_common())
 
 # --- Game Storage ---
-active_connect_four_games = {}
-active_hangman_games = {}
-active_word_ladder_games = {}
-active_tictactoe_games = {}
-active_anagram_games = {}
-active_guess_the_number_games = {}
+# Every running game lives in one registry keyed by its game id. Sessions expire after the same
+# idle time as their View, the oldest idle session is evicted when the registry is full, and each
+# user/guild can only hold a limited number of games at once.
+GAME_TIMEOUTS = {"connectfour": 300, "hangman": 300, "wordladder": 300, "tictactoe": 300, "anagram": 120, "guessthenumber": 180}
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "10000"))
+MAX_GAMES_PER_USER = int(os.getenv("MAX_GAMES_PER_USER", "3"))
+MAX_GAMES_PER_GUILD = int(os.getenv("MAX_GAMES_PER_GUILD", "200"))
+class GameSession:
+    __slots__ = ("game", "state", "users", "guild_id", "expires")
+    def __init__(self, game, state, users, guild_id):
+        self.game, self.state, self.users, self.guild_id = game, state, tuple(users), guild_id
+        self.expires = time.monotonic() + GAME_TIMEOUTS[game]
+class SessionRegistry:
+    def __init__(self, capacity=MAX_SESSIONS, per_user=MAX_GAMES_PER_USER, per_guild=MAX_GAMES_PER_GUILD):
+        self.capacity, self.per_user, self.per_guild = capacity, per_user, per_guild
+        self.sessions = collections.OrderedDict()
+        self.user_counts, self.guild_counts = collections.Counter(), collections.Counter()
+        self.started, self.ended, self.expired, self.evicted = collections.Counter(), collections.Counter(), collections.Counter(), collections.Counter()
+        self.store, self.memory_bytes = None, 0 # memory_bytes: last memory_estimate(), refreshed by the sweep
+    def __len__(self): return len(self.sessions)
+    def __contains__(self, gid): return self.get(gid, touch=False) is not None
+    def check_limits(self, users, guild_id=None):
+        for u in users:
+            if self.user_counts[u] >= self.per_user: return f"<@{u}> already has {self.per_user} games running. Finish one first!"
+        if guild_id is not None and self.guild_counts[guild_id] >= self.per_guild: return "This server has too many games running right now. Try again later!"
+        return None
+    def add(self, game, gid, state, users, guild_id=None):
+        self.remove(gid)
+        while len(self.sessions) >= self.capacity: self._drop(next(iter(self.sessions)), self.evicted)
+        s = self.sessions[gid] = GameSession(game, state, users, guild_id); state["id"] = gid
+        for u in s.users: self.user_counts[u] += 1
+        if guild_id is not None: self.guild_counts[guild_id] += 1
+        self.started[game] += 1
+        if self.store: self.store.save(gid, s)
+        return state
+    def restore(self, game, gid, state, users, guild_id, expires_at):
+        ttl = expires_at - time.time()
+        if ttl <= 0 or gid in self.sessions or len(self.sessions) >= self.capacity: return False
+        s = self.sessions[gid] = GameSession(game, state, users, guild_id); s.expires = time.monotonic() + ttl; state["id"] = gid
+        for u in s.users: self.user_counts[u] += 1
+        if guild_id is not None: self.guild_counts[guild_id] += 1
+        return True
+    def get(self, gid, touch=True):
+        s = self.sessions.get(gid)
+        if s is None: return None
+        now = time.monotonic()
+        if now >= s.expires: self._drop(gid, self.expired); return None
+        if touch:
+            s.expires = now + GAME_TIMEOUTS[s.game]; self.sessions.move_to_end(gid)
+            if self.store: self.store.save(gid, s)
+        return s.state
+    def remove(self, gid):
+        s = self.sessions.get(gid)
+        return self._drop(gid, self.ended).state if s else None
+    def _drop(self, gid, reason):
+        s = self.sessions.pop(gid)
+        for counter, key in [(self.user_counts, u) for u in s.users] + [(self.guild_counts, s.guild_id)]:
+            if key is None or key not in counter: continue
+            counter[key] -= 1
+            if counter[key] <= 0: del counter[key]
+        reason[s.game] += 1
+        if self.store: self.store.delete(gid)
+        return s
+    def sweep(self):
+        now = time.monotonic(); stale = [gid for gid, s in self.sessions.items() if now >= s.expires]
+        for gid in stale: self._drop(gid, self.expired)
+        return len(stale)
+    def counts(self):
+        c = collections.Counter(s.game for s in self.sessions.values())
+        return {g: c[g] for g in GAME_TIMEOUTS}
+    def memory_estimate(self):
+        seen, total, stack = set(), sys.getsizeof(self.sessions), [s for s in self.sessions.values()]
+        while stack:
+            o = stack.pop()
+            if id(o) in seen: continue
+            seen.add(id(o)); total += sys.getsizeof(o)
+            if isinstance(o, GameSession): stack.extend((o.state, o.users))
+            elif isinstance(o, dict): stack.extend(o.values())
+            elif isinstance(o, (list, tuple, set, frozenset)): stack.extend(o)
+        return total
+    def stats(self):
+        return {"active": len(self.sessions), "capacity": self.capacity, "by_game": self.counts(), "memory_bytes": self.memory_estimate(),
+                "started": dict(self.started), "ended": dict(self.ended), "expired": dict(self.expired), "evicted": dict(self.evicted)}
+sessions = SessionRegistry()
+
 
+# --- Game Persistence ---
+# Sessions are written behind to SQLite: touching a session only marks it dirty, and a background
+# task serializes every dirty session once per flush and writes the batch in a single transaction,
+# so a burst of clicks on one game costs one row write. Win/loss stats ride on the same batches.
+DB_PATH = os.getenv("PUZZLES_DB", "puzzles.db")
+DB_FLUSH_INTERVAL = float(os.getenv("PUZZLES_DB_FLUSH_INTERVAL", "0.5"))
+def encode_state(gs): return json.dumps(gs, default=_encode_value, separators=(",", ":"))
+def decode_state(raw): return json.loads(raw, object_hook=_decode_value)
+def _encode_value(o):
+    if isinstance(o, C4Board): return {"$c4": o.masks}
+    if isinstance(o, (set, frozenset)): return {"$set": sorted(o)}
+    raise TypeError(f"Cannot persist {type(o).__name__}")
+def _decode_value(d):
+    if "$c4" in d: return C4Board(tuple(d["$c4"]))
+    if "$set" in d: return set(d["$set"])
+    return d
+class GameStore:
+    def __init__(self, path=DB_PATH, flush_interval=DB_FLUSH_INTERVAL):
+        self.path, self.flush_interval, self.db, self.lock = path, flush_interval, None, threading.Lock()
+        self.dirty, self.stat_deltas = {}, collections.Counter()
+        self.metrics = collections.Counter()
+    def open(self):
+        self.db = sqlite3.connect(self.path, timeout=30, check_same_thread=False) # workers of a sharded deployment share the file
+        self.db.execute("PRAGMA journal_mode=WAL"); self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS games (id INTEGER PRIMARY KEY, game TEXT NOT NULL, guild_id INTEGER, users TEXT NOT NULL, state TEXT NOT NULL, expires_at REAL NOT NULL)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS stats (user_id INTEGER NOT NULL, game TEXT NOT NULL, wins INTEGER NOT NULL DEFAULT 0, losses INTEGER NOT NULL DEFAULT 0, draws INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (user_id, game))")
+        self.metrics["pruned"] += self.db.execute("DELETE FROM games WHERE expires_at <= ?", (time.time(),)).rowcount # games that expired while no worker was running
+        self.db.commit()
+        return self
+    def save(self, gid, session):
+        if gid in self.dirty: self.metrics["coalesced"] += 1
+        self.dirty[gid] = session; self.metrics["queued"] += 1
+    def delete(self, gid): self.dirty[gid] = None; self.metrics["queued"] += 1
+    def record(self, game, wins=(), losses=(), draws=()):
+        for col, users in (("wins", wins), ("losses", losses), ("draws", draws)):
+            for u in users: self.stat_deltas[(u, game, col)] += 1
+    def load(self):
+        with self.lock: rows = self.db.execute("SELECT id, game, guild_id, users, state, expires_at FROM games WHERE expires_at > ?", (time.time(),)).fetchall()
+        return [(gid, game, guild_id, json.loads(users), decode_state(state), expires_at) for gid, game, guild_id, users, state, expires_at in rows]
+    async def flush(self):
+        if not self.dirty and not self.stat_deltas: return
+        dirty, self.dirty, deltas, self.stat_deltas = self.dirty, {}, self.stat_deltas, collections.Counter()
+        now, mono, upserts, deletes = time.time(), time.monotonic(), [], []
+        for gid, s in dirty.items():
+            if s is None: deletes.append((gid,))
+            else: upserts.append((gid, s.game, s.guild_id, json.dumps(s.users), encode_state(s.state), now + s.expires - mono))
+        stats = [(u, game, n if col == "wins" else 0, n if col == "losses" else 0, n if col == "draws" else 0) for (u, game, col), n in deltas.items()]
+        try: await asyncio.to_thread(self._write, upserts, deletes, stats)
+        except sqlite3.Error:
+            self.dirty = {**dirty, **self.dirty}; self.stat_deltas.update(deltas); raise
+        self.metrics["batches"] += 1; self.metrics["rows"] += len(upserts) + len(deletes) + len(stats)
+    def _write(self, upserts, deletes, stats):
+        with self.lock, self.db:
+            self.db.executemany("INSERT OR REPLACE INTO games (id, game, guild_id, users, state, expires_at) VALUES (?, ?, ?, ?, ?, ?)", upserts)
+            self.db.executemany("DELETE FROM games WHERE id = ?", deletes)
+            self.db.executemany("INSERT INTO stats (user_id, game, wins, losses, draws) VALUES (?, ?, ?, ?, ?) ON CONFLICT (user_id, game) DO UPDATE SET wins = wins + excluded.wins, losses = losses + excluded.losses, draws = draws + excluded.draws", stats)
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try: await self.flush()
+            except sqlite3.Error as e: print(f"ERROR: failed to persist games: {e}")
+    async def leaderboard(self, game=None, limit=10):
+        q = "SELECT user_id, SUM(wins), SUM(losses), SUM(draws) FROM stats" + (" WHERE game = ?" if game else "") + " GROUP BY user_id ORDER BY SUM(wins) DESC, SUM(losses) ASC LIMIT ?"
+        def query():
+            with self.lock: return self.db.execute(q, (game, limit) if game else (limit,)).fetchall()
+        return await asyncio.to_thread(query)
+    def close(self):
+        with self.lock: self.db.close(); self.db = None
+store = GameStore() if DB_PATH else None
+def record_result(game, wins=(), losses=(), draws=()):
+    if not store: return
+    me = bot.user.id if bot.user else None
+    store.record(game, [u for u in wins if u != me], [u for u in losses if u != me], [u for u in draws if u != me])
 
 # --- Word Loading Logic ---
-WL_VALID_WORDS = set()
-WL_PAIRS = []
-HM_EASY_WORDS, HM_MEDIUM_WORDS, HM_HARD_WORDS = [], [], []
-
-try:
-    with open('words.json', 'r') as f:
-        data = json.load(f)
-        ladder_words = [word.upper() for word in data.get('ladder_words', []) if len(word) == 4]
-        WL_VALID_WORDS = set(ladder_words)
-        if len(ladder_words) > 1:
-            for _ in range(20):
-                WL_PAIRS.append(tuple(random.sample(ladder_words, 2)))
-
-        hangman_words = data.get('hangman_words', [])
-        for word in hangman_words:
-            l = len(word)
-            if l <= 4: HM_EASY_WORDS.append(word.upper())
-            elif l <= 6: HM_MEDIUM_WORDS.append(word.upper())
-            else: HM_HARD_WORDS.append(word.upper())
-        print("Successfully loaded words from words.json")
-except FileNotFoundError:
-    print("ERROR: words.json not found.")
-except (json.JSONDecodeError, KeyError):
-    print("ERROR: words.json is not formatted correctly.")
+# words.json is compiled into per-game index parts (hangman index, ladder graph, anagram signatures)
+# that are pickled under WORD_CACHE_DIR, keyed by the source file's hash. A part is only loaded or
+# compiled the first time a game asks for it, and /reloadwords builds a new bank off the event loop
+# and swaps it in with a single assignment, so running games never see a half-built index.
+WORDS_PATH = os.getenv("PUZZLES_WORDS", "words.json")
+WORD_CACHE_DIR = os.getenv("PUZZLES_CACHE_DIR", ".cache")
+WORD_INDEX_VERSION = 4
+def bucket_by_length(ws):
+    part = {"easy": [], "medium": [], "hard": []}
+    for word in ws: part["easy" if len(word) <= 4 else "medium" if len(word) <= 6 else "hard"].append(word)
+    return part
+# Hangman words are grouped by length. Within a length every (letter, revealed positions) pair is
+# an outcome with a dense key, since guessing a letter reveals exactly one of them, and per letter
+# the words are sorted by outcome so each outcome's words are one ascending slice (a posting list).
+# A game state's candidates are the shortest posting list among its guesses filtered by the others,
+# and letter counts and entropies come from a histogram over outcome keys: stored for the whole
+# length and for every posting list longer than HM_SPLIT_SIZE, and otherwise counted from whichever
+# side of the filter is smaller. The keyboard is the 24 most common letters (the 25th button is the
+# hint) and only words typeable on it are playable.
+# Difficulty is how many words still share a word's pattern after the typical opening guesses
+# (the HM_TYPICAL_GUESSES most common letters), with misses among those guesses breaking ties.
+HM_KEYBOARD_SIZE, HM_TYPICAL_GUESSES, HM_SPLIT_SIZE = 24, 6, 2048
+def compile_hangman_words(data):
+    ws = sorted({w.upper() for w in data.get('hangman_words', []) if w.isalpha() and w.isascii()})
+    freq = collections.Counter(c for w in ws for c in set(w))
+    letters = "".join(sorted(c for c, _ in freq.most_common(HM_KEYBOARD_SIZE)))
+    ws = [w for w in ws if set(w) <= set(letters)]
+    typical = np.zeros(26, bool); typical[[ord(c) - 65 for c, _ in freq.most_common(HM_TYPICAL_GUESSES)]] = True
+    lengths, scored = {}, []
+    for n in sorted({len(w) for w in ws}):
+        group = [w for w in ws if len(w) == n]
+        codes = np.frombuffer("".join(group).encode(), np.uint8).reshape(len(group), n) - 65
+        contains, positions = np.zeros((len(group), 26), bool), np.zeros((len(group), 26), np.uint32)
+        for p in range(n):
+            contains[np.arange(len(group)), codes[:, p]] = True
+            np.bitwise_or.at(positions, (np.arange(len(group)), codes[:, p]), np.uint32(1 << p))
+        masks = [np.union1d(positions[:, l], [0]) for l in range(26)] # mask 0 (a miss) is always each letter's first key
+        base = np.cumsum([0] + [len(m) for m in masks]); k = int(base[-1])
+        outcome = np.stack([base[l] + np.searchsorted(masks[l], positions[:, l]) for l in range(26)]).astype(np.min_scalar_type(k)) # (26, words), one row per letter
+        order = np.argsort(outcome, axis=1, kind="stable").astype(np.uint32)
+        root = np.bincount(outcome.ravel(), minlength=k)
+        starts = np.concatenate([np.cumsum(root[base[l]:base[l + 1]]) - root[base[l]:base[l + 1]] for l in range(26)])
+        letter = np.repeat(np.arange(26), np.diff(base))
+        splits = {j: np.bincount(outcome[:, order[letter[j], starts[j]:starts[j] + root[j]]].ravel(), minlength=k).astype(np.int32) for j in np.flatnonzero(root > HM_SPLIT_SIZE).tolist()}
+        lengths[n] = {"words": group, "outcome": outcome, "order": order, "base": base, "masks": np.concatenate(masks), "root": root, "splits": splits,
+                      "keys": {(l, int(m)): (int(base[l]) + j, int(starts[base[l] + j]), int(starts[base[l] + j] + root[base[l] + j])) for l in range(26) for j, m in enumerate(masks[l])}}
+        _, inverse, counts = np.unique(np.where(typical[codes], codes, 26), axis=0, return_inverse=True, return_counts=True)
+        misses = typical.sum() - (contains & typical).sum(axis=1)
+        scored += zip(counts[inverse.reshape(-1)].tolist(), misses.tolist(), group)
+    scored.sort(); k = len(scored)
+    buckets = {d: [w for _, _, w in scored[k * j // 3:k * (j + 1) // 3]] for j, d in enumerate(("easy", "medium", "hard"))}
+    return {"letters": letters, "lengths": lengths, "buckets": buckets, "scores": {w: (r, m) for r, m, w in scored}}
+def compile_ladder_words(data):
+    ladder_words = {word.upper() for word in data.get('ladder_words', []) if len(word) >= 2 and word.isalpha()}
+    graph = wl_build_graph(ladder_words)
+    return {"words": frozenset(ladder_words), "graph": graph, "starts": {k: sorted(w for w, n in g.items() if n) for k, g in graph.items()}}
+def compile_anagram_signatures(data):
+    sigs = {}
+    for word in {w.upper() for w in data.get('hangman_words', []) + data.get('ladder_words', []) if w.isalpha()}:
+        sigs.setdefault("".join(sorted(word)), set()).add(word)
+    sigs = {sig: frozenset(ws) for sig, ws in sigs.items()}
+    by_length = bucket_by_length(sorted({w.upper() for w in data.get('hangman_words', []) if w.isalpha()}))
+    unique = {d: [w for w in ws if len(sigs["".join(sorted(w))]) == 1] for d, ws in by_length.items()}
+    return {"signatures": sigs, "unique": unique, "by_length": by_length}
+WORD_INDEX_PARTS = {"hangman": compile_hangman_words, "ladder": compile_ladder_words, "anagrams": compile_anagram_signatures}
+GAME_WORD_PARTS = {"hangman": "hangman", "wordladder": "ladder", "anagram": "anagrams"}
+class WordBank:
+    def __init__(self, path=WORDS_PATH, cache_dir=WORD_CACHE_DIR):
+        self.path, self.cache_dir, self.parts, self.lock, self.source = path, cache_dir, {}, threading.Lock(), None
+        try:
+            with open(path, 'rb') as f: self.raw = f.read()
+            print(f"Successfully loaded words from {path}")
+        except FileNotFoundError:
+            print(f"ERROR: {path} not found."); self.raw = b"{}"
+        self.digest = hashlib.sha256(self.raw).hexdigest()[:16]
+    def part(self, name):
+        part = self.parts.get(name)
+        if part is None:
+            with self.lock:
+                part = self.parts.get(name)
+                if part is None: part = self.parts[name] = self._load_part(name)
+        return part
+    def _load_part(self, name):
+        cache = os.path.join(self.cache_dir, f"words-{self.digest}-{name}-v{WORD_INDEX_VERSION}.pickle")
+        try:
+            with open(cache, 'rb') as f: return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError): pass
+        part = WORD_INDEX_PARTS[name](self._source())
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True); tmp = f"{cache}.{os.getpid()}.tmp"
+            with open(tmp, 'wb') as f: pickle.dump(part, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, cache)
+        except OSError as e: print(f"ERROR: could not write word index cache {cache}: {e}")
+        return part
+    def _source(self):
+        if self.source is None:
+            try: self.source = json.loads(self.raw)
+            except (json.JSONDecodeError, UnicodeDecodeError): print(f"ERROR: {self.path} is not formatted correctly."); self.source = {}
+        return self.source
+    async def load(self, name): return self.parts.get(name) or await asyncio.to_thread(self.part, name)
+    def warm(self, names=WORD_INDEX_PARTS):
+        for name in names: self.part(name)
+        return self
+words = WordBank()
+async def reload_words():
+    global words
+    new = await asyncio.to_thread(lambda: WordBank(words.path, words.cache_dir).warm(list(words.parts) or WORD_INDEX_PARTS))
+    words = new; wl_distances.cache_clear(); hm_candidates.cache_clear(); hm_outcomes.cache_clear(); hm_letter_stats.cache_clear()
+    return new
 
 
 # --- Game Logic (Grouped by Game) ---
 
 # --- Word Ladder Logic ---
-def wl_get_word_pair():
-    return random.choice(WL_PAIRS) if WL_PAIRS else ("WORD", "GAME")
+# Adjacency is precomputed through wildcard buckets ("C_LD" holds COLD, CALD, ...), so words only
+# meet the words they share a bucket with instead of every word of the same length.
+# Par comes from the pair search and is kept in the game state. Full distance maps are only kept
+# for the goal words of running games (WL_GOAL_CACHE_SIZE of them) and are always looked up in a
+# worker thread, since a miss (eviction, restart, /reloadwords) means a BFS over the whole graph.
+# Picking a pair only explores up to the longest allowed par, also in a worker thread.
+WL_PAR_RANGE, WL_GOAL_CACHE_SIZE = {"easy": (2, 4), "hard": (3, 6)}, 64
+def wl_graph_key(difficulty): return "hard" if difficulty == "hard" else "easy"
+def wl_build_graph(words):
+    b1, b2 = {}, {}
+    for w in words:
+        for a in range(len(w)):
+            b1.setdefault(w[:a] + "_" + w[a+1:], []).append(w)
+            for b in range(a + 1, len(w)): b2.setdefault(w[:a] + "_" + w[a+1:b] + "_" + w[b+1:], []).append(w)
+    graph = {}
+    for key, buckets in (("hard", b1), ("easy", b2)):
+        adj = {w: set() for w in words}
+        for bucket in buckets.values():
+            if len(bucket) > 1:
+                for w in bucket: adj[w].update(bucket)
+        graph[key] = {w: frozenset(n - {w}) for w, n in adj.items()}
+    return graph
+def wl_bfs(word, difficulty="hard", depth=None):
+    g, dist, frontier, d = words.part("ladder")["graph"][wl_graph_key(difficulty)], {word: 0}, [word], 0
+    while frontier and (depth is None or d < depth):
+        d += 1; nxt = []
+        for w in frontier:
+            for n in g.get(w, ()):
+                if n not in dist: dist[n] = d; nxt.append(n)
+        frontier = nxt
+    return dist
+@functools.lru_cache(maxsize=WL_GOAL_CACHE_SIZE)
+def wl_distances(word, difficulty="hard"): return wl_bfs(word, difficulty)
+def wl_shortest_path(start, end, difficulty="hard"):
+    g = words.part("ladder")["graph"][wl_graph_key(difficulty)]
+    if start not in g or end not in g: return None
+    if start == end: return [start]
+    parents = ({start: None}, {end: None}); frontiers = ([start], [end])
+    while frontiers[0] and frontiers[1]:
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        seen, other, nxt = parents[side], parents[1 - side], []
+        for w in frontiers[side]:
+            for n in g[w]:
+                if n in seen: continue
+                seen[n] = w; nxt.append(n)
+                if n in other:
+                    path, x = [], n
+                    while x is not None: path.append(x); x = parents[0][x]
+                    path.reverse(); x = parents[1][n]
+                    while x is not None: path.append(x); x = parents[1][x]
+                    return path
+        frontiers = (nxt, frontiers[1]) if side == 0 else (frontiers[0], nxt)
+    return None
+def wl_remaining(word, end, difficulty="hard"): return wl_distances(end, difficulty).get(word)
+def wl_get_word_pair(difficulty="hard", min_steps=None, max_steps=None, tries=20):
+    starts = words.part("ladder")["starts"][wl_graph_key(difficulty)]
+    if not starts: return ("WORD", "GAME", None)
+    lo, hi = WL_PAR_RANGE[wl_graph_key(difficulty)]
+    lo, hi = min_steps or lo, max_steps or hi
+    fallback = None
+    for _ in range(tries):
+        s = random.choice(starts); dist = wl_bfs(s, difficulty, hi)
+        ends = [w for w, d in dist.items() if lo <= d]
+        if ends: e = random.choice(ends); fallback = (s, e, dist[e]); break
+        far = max(dist, key=dist.get)
+        if far != s and (fallback is None or dist[far] > fallback[2]): fallback = (s, far, dist[far])
+    return fallback or ("WORD", "GAME", None)
 def wl_is_valid_move(current, next_w, difficulty="hard"):
-    if next_w.upper() not in WL_VALID_WORDS or len(current) != len(next_w): return False
-    diff = sum(1 for c1, c2 in zip(current, next_w) if c1 != c2)
-    return diff == 1 if difficulty == "hard" else 1 <= diff <= 2
+    return next_w.upper() in words.part("ladder")["graph"][wl_graph_key(difficulty)].get(current.upper(), ())
+@metrics.timed("render")
 def wl_format_ladder(ladder): return " → ".join(ladder) if ladder else "No words yet."
+@metrics.timed("render")
+def wl_format_goal(gs):
+    par = gs.get("par")
+    return f"**Goal:** `{gs['start_word']}` → `{gs['end_word']}`" + (f" (par: **{par}** moves)" if par else "")
 
 # --- Connect Four Logic ---
+# Bitboard layout: column c owns bits c*7 .. c*7+5 (bottom row first) and bit c*7+6 is an
+# always-empty sentinel, so shifted windows never wrap from one column into the next.
 C4_ROWS, C4_COLS, C4_EMPTY, C4_P1, C4_P2 = 6, 7, "⚪", "🔴", "🟡"
-def c4_create_board(): return np.full((C4_ROWS, C4_COLS), C4_EMPTY)
-def c4_drop_piece(b, r, c, p): b[r][c] = p
-def c4_is_valid_location(b, c): return b[0][c] == C4_EMPTY
-def c4_get_next_open_row(b, c):
-    for r in range(C4_ROWS - 1, -1, -1):
-        if b[r][c] == C4_EMPTY: return r
-    return None
-def c4_check_win(b, p):
-    for c in range(C4_COLS - 3):
-        for r in range(C4_ROWS):
-            if all(b[r][c+i] == p for i in range(4)): return True
-    for c in range(C4_COLS):
-        for r in range(C4_ROWS - 3):
-            if all(b[r+i][c] == p for i in range(4)): return True
-    for c in range(C4_COLS - 3):
-        for r in range(C4_ROWS - 3):
-            if all(b[r+i][c+i] == p for i in range(4)): return True
-    for c in range(C4_COLS - 3):
-        for r in range(3, C4_ROWS):
-            if all(b[r-i][c+i] == p for i in range(4)): return True
+C4_H, C4_CELLS = C4_ROWS + 1, C4_ROWS * C4_COLS
+C4_COL_MASK = (1 << C4_ROWS) - 1
+def c4_is_win(m):
+    for s in (1, C4_H, C4_H - 1, C4_H + 1):
+        x = m & (m >> s)
+        if x & (x >> 2 * s): return True
     return False
-def c4_format_board(b):
+class C4Board:
+    __slots__ = ("masks", "heights", "moves")
+    def __init__(self, masks=(0, 0)):
+        self.masks, both = list(masks), masks[0] | masks[1]
+        self.heights = [c * C4_H + bin((both >> c * C4_H) & C4_COL_MASK).count("1") for c in range(C4_COLS)]
+        self.moves = bin(both).count("1")
+    @property
+    def turn(self): return self.moves & 1
+    def can_play(self, c): return 0 <= c < C4_COLS and self.heights[c] < c * C4_H + C4_ROWS
+    def play(self, c):
+        p = self.moves & 1; self.masks[p] |= 1 << self.heights[c]; self.heights[c] += 1; self.moves += 1
+        return c4_is_win(self.masks[p])
+    def is_full(self): return self.moves == C4_CELLS
+    def cell(self, r, c):
+        bit = 1 << (c * C4_H + C4_ROWS - 1 - r)
+        return 0 if self.masks[0] & bit else 1 if self.masks[1] & bit else 2
+def c4_create_board(): return C4Board()
+@metrics.timed("render")
+def c4_format_board(b, pieces=(C4_P1, C4_P2)):
     h = "".join([f"{i+1}\u20e3" for i in range(C4_COLS)]) + "\n"
-    return h + "\n".join(["".join(r) for r in b])
+    cells = tuple(pieces) + (C4_EMPTY,)
+    return h + "\n".join("".join(cells[b.cell(r, c)] for c in range(C4_COLS)) for r in range(C4_ROWS))
+
+# --- Connect Four AI ---
+# Negamax with alpha-beta, iterative deepening under a time budget and a fixed-size transposition
+# table. Searches run in a worker process (see c4_ai_move) so they never block the event loop.
+C4_AI_LEVELS = {"easy": (1, 0.1), "medium": (5, 0.75), "hard": (C4_CELLS, float(os.getenv("C4_AI_TIME_BUDGET", "3.0")))}
+C4_AI_WORKERS, C4_TT_SIZE = int(os.getenv("C4_AI_WORKERS", "2")), 1 << 20
+C4_WIN = 10_000
+C4_BOTTOM = sum(1 << (c * C4_H) for c in range(C4_COLS))
+C4_BOARD = C4_BOTTOM * C4_COL_MASK
+C4_ORDER = sorted(range(C4_COLS), key=lambda c: abs(C4_COLS // 2 - c))
+class C4SearchTimeout(Exception): pass
+class C4TranspositionTable:
+    # Slot = key % size; a colliding entry replaces the old one unless the old one was searched deeper.
+    __slots__ = ("size", "keys", "entries")
+    def __init__(self, size=C4_TT_SIZE): self.size, self.keys, self.entries = size, [0] * size, [None] * size
+    def get(self, key):
+        s = key % self.size
+        return self.entries[s] if self.keys[s] == key else None
+    def put(self, key, depth, flag, value, move):
+        s = key % self.size; old = self.entries[s]
+        if self.keys[s] != key and old is not None and old[0] > depth: return
+        self.keys[s], self.entries[s] = key, (depth, flag, value, move)
+_c4_tt = None
+def c4_winning_cells(pos, mask):
+    r = (pos << 1) & (pos << 2) & (pos << 3)
+    for s in (C4_H, C4_H - 1, C4_H + 1):
+        p = (pos << s) & (pos << 2 * s); r |= p & (pos << 3 * s); r |= p & (pos >> s)
+        p = (pos >> s) & (pos >> 2 * s); r |= p & (pos << s); r |= p & (pos >> 3 * s)
+    return r & (C4_BOARD ^ mask)
+def c4_evaluate(cur, mask):
+    opp = cur ^ mask
+    return 4 * (bin(c4_winning_cells(cur, mask)).count("1") - bin(c4_winning_cells(opp, mask)).count("1")) + bin(cur & C4_CENTER).count("1") - bin(opp & C4_CENTER).count("1")
+C4_CENTER = C4_COL_MASK << (C4_COLS // 2 * C4_H)
+def _c4_negamax(cur, mask, moves, depth, alpha, beta, ctx):
+    ctx[1] += 1
+    if not ctx[1] & 1023 and time.monotonic() > ctx[0]: raise C4SearchTimeout
+    possible = (mask + C4_BOTTOM) & C4_BOARD
+    if possible & c4_winning_cells(cur, mask): return C4_WIN - moves - 1, None
+    if moves >= C4_CELLS - 1: return 0, None
+    threats = c4_winning_cells(cur ^ mask, mask); forced = possible & threats
+    if forced:
+        if forced & (forced - 1): return -(C4_WIN - moves - 2), None
+        possible = forced
+    possible &= ~(threats >> 1)
+    if not possible: return -(C4_WIN - moves - 2), None
+    if depth <= 0: return c4_evaluate(cur, mask), None
+    key, alpha0, tt_move = cur + mask, alpha, None
+    entry = ctx[2].get(key)
+    if entry:
+        d, flag, value, tt_move = entry
+        if d >= depth:
+            if flag == 0: return value, tt_move
+            if flag < 0: beta = min(beta, value)
+            else: alpha = max(alpha, value)
+            if alpha >= beta: return value, tt_move
+    cands = [possible & (C4_COL_MASK << (c * C4_H)) for c in C4_ORDER]
+    cands = sorted((m for m in cands if m), key=lambda m: (m != tt_move, -bin(c4_winning_cells(cur | m, mask | m)).count("1")))
+    best, best_move = -C4_WIN - 1, cands[0]
+    for m in cands:
+        score = -_c4_negamax(cur ^ mask, mask | m, moves + 1, depth - 1, -beta, -alpha, ctx)[0]
+        if score > best: best, best_move = score, m
+        alpha = max(alpha, score)
+        if alpha >= beta: break
+    ctx[2].put(key, depth, -1 if best <= alpha0 else 1 if best >= beta else 0, best, best_move)
+    return best, best_move
+def c4_search_move(cur, mask, moves, max_depth, budget):
+    global _c4_tt
+    if _c4_tt is None: _c4_tt = C4TranspositionTable()
+    ctx = [time.monotonic() + budget, 0, _c4_tt]
+    possible = (mask + C4_BOTTOM) & C4_BOARD; win = possible & c4_winning_cells(cur, mask)
+    if win: return ((win & -win).bit_length() - 1) // C4_H
+    best = next(possible & (C4_COL_MASK << (c * C4_H)) for c in C4_ORDER if possible & (C4_COL_MASK << (c * C4_H)))
+    for depth in range(1, max_depth + 1):
+        try: score, move = _c4_negamax(cur, mask, moves, depth, -C4_WIN - 1, C4_WIN + 1, ctx)
+        except C4SearchTimeout: break
+        if move: best = move
+        if abs(score) > C4_WIN - C4_CELLS - 2: break
+    return (best.bit_length() - 1) // C4_H
+_c4_pool = None
+async def c4_ai_move(b, level="medium"):
+    global _c4_pool
+    if _c4_pool is None: _c4_pool = concurrent.futures.ProcessPoolExecutor(max_workers=C4_AI_WORKERS)
+    depth, budget = C4_AI_LEVELS.get(level, C4_AI_LEVELS["medium"])
+    cur, mask = b.masks[b.turn], b.masks[0] | b.masks[1]
+    return await asyncio.get_running_loop().run_in_executor(_c4_pool, c4_search_move, cur, mask, b.moves, depth, budget)
 
 # --- Hangman Logic ---
 HANGMAN_PICS = ['```\n  +---+\n  |   |\n      |\n      |\n      |\n      |\n=========\n```', '```\n  +---+\n  |   |\n  O   |\n      |\n      |\n      |\n=========\n```', '```\n  +---+\n  |   |\n  O   |\n  |   |\n      |\n      |\n=========\n```', '```\n  +---+\n  |   |\n  O   |\n /|   |\n      |\n      |\n=========\n```', '```\n  +---+\n  |   |\n  O   |\n /|\\  |\n      |\n      |\n=========\n```', '```\n  +---+\n  |   |\n  O   |\n /|\\  |\n /    |\n      |\n=========\n```', '```\n  +---+\n  |   |\n  O   |\n /|\\  |\n / \\  |\n      |\n=========\n```']
+HM_CACHE_SIZE = 4096
 def hm_get_random_word(difficulty="medium"):
-    if difficulty == "easy" and HM_EASY_WORDS: return random.choice(HM_EASY_WORDS)
-    if difficulty == "hard" and HM_HARD_WORDS: return random.choice(HM_HARD_WORDS)
-    return random.choice(HM_MEDIUM_WORDS) if HM_MEDIUM_WORDS else "PUZZLE"
+    buckets = words.part("hangman")["buckets"]
+    if difficulty in ("easy", "hard") and buckets[difficulty]: return random.choice(buckets[difficulty])
+    return random.choice(buckets["medium"]) if buckets["medium"] else "PUZZLE"
+def hm_state_key(word, guessed):
+    # (revealed pattern, excluded letters): the pattern carries the length, e.g. ("_A__E", "ST").
+    return "".join(c if c in guessed else "_" for c in word), "".join(sorted(guessed.difference(word)))
+def hm_cut(g, pattern, excluded):
+    # The shortest posting list among the guesses as (size, letter, key, start, end), its word
+    # indices, and which of them show the other guesses' outcomes too (None when there are no other
+    # guesses). (None, None, None) before any guess, and None if some guess's outcome never occurs.
+    want = dict.fromkeys(excluded, 0)
+    for p, c in enumerate(pattern):
+        if c != "_": want[c] = want.get(c, 0) | 1 << p
+    spans = []
+    for c, m in want.items():
+        key = g["keys"].get((ord(c) - 65, m))
+        if key is None: return None
+        spans.append((key[2] - key[1], ord(c) - 65, *key))
+    if not spans: return None, None, None
+    spans.sort(); cut, keep = spans[0], None
+    ids = g["order"][cut[1], cut[3]:cut[4]]
+    for _, l, key, _, _ in spans[1:]:
+        if keep is None: keep = g["outcome"][l][ids] == key
+        else: sel = np.flatnonzero(keep); keep[sel] = g["outcome"][l][ids[sel]] == key
+    return cut, ids, keep
+@functools.lru_cache(maxsize=HM_CACHE_SIZE)
+def hm_candidates(pattern, excluded):
+    # Indices (ascending) of the words of this length that fit the revealed pattern and misses.
+    g = words.part("hangman")["lengths"].get(len(pattern))
+    cut = hm_cut(g, pattern, excluded) if g else None
+    if cut is None: return np.empty(0, np.intp)
+    _, ids, keep = cut
+    idx = np.arange(len(g["words"])) if ids is None else ids if keep is None else ids[keep]; idx.flags.writeable = False
+    return idx
+@functools.lru_cache(maxsize=HM_CACHE_SIZE)
+def hm_outcomes(pattern, excluded):
+    # How many candidates show each outcome key, or None if there are no candidates.
+    g = words.part("hangman")["lengths"].get(len(pattern))
+    cut = hm_cut(g, pattern, excluded) if g else None
+    if cut is None: return None
+    span, ids, keep = cut
+    if span is None: return g["root"]
+    size, k = span[0], len(g["masks"])
+    n = size if keep is None else int(keep.sum())
+    if not n: return None
+    split = g["splits"].get(span[2])
+    if split is None or n <= size - n: return np.bincount(g["outcome"][:, ids if keep is None else ids[keep]].ravel(), minlength=k)
+    return split if keep is None else split - np.bincount(g["outcome"][:, ids[~keep]].ravel(), minlength=k)
+@functools.lru_cache(maxsize=HM_CACHE_SIZE)
+def hm_letter_stats(pattern, excluded):
+    # Per letter: how many candidates contain it, and the entropy (bits) of the reveal pattern that
+    # guessing it would produce.
+    g, hist = words.part("hangman")["lengths"].get(len(pattern)), hm_outcomes(pattern, excluded)
+    if hist is None: return np.zeros(26, np.intp), np.zeros(26)
+    first = g["base"][:-1]; n = int(hist[:first[1]].sum())
+    entropy = np.log2(n) - np.add.reduceat(hist * np.log2(np.maximum(hist, 1)), first) / n
+    return n - hist[first], entropy
+def hm_hint(word, guessed):
+    pattern, excluded = hm_state_key(word, guessed)
+    counts, entropy = (a.tolist() for a in hm_letter_stats(pattern, excluded)); n = len(hm_candidates(pattern, excluded))
+    options = [c for c in words.part("hangman")["letters"] if c not in guessed]
+    if not options or not n: return None, 0, n
+    best = max(options, key=lambda c: (round(entropy[ord(c) - 65], 9), counts[ord(c) - 65]))
+    return best, counts[ord(best) - 65], n
+def hm_dodge(word, guessed, letter):
+    # Adversarial mode: swap the secret for a word from the largest group of candidates that share
+    # one outcome for this guess, preferring the group that misses, so the answer stays ambiguous.
+    # Group sizes come from the outcome histogram and the group itself is the next state's candidates.
+    pattern, excluded = hm_state_key(word, guessed)
+    g, l = words.part("hangman")["lengths"].get(len(word)), ord(letter) - 65
+    hist = hm_outcomes(pattern, excluded) if g else None
+    if hist is None: return word
+    sizes = hist[g["base"][l]:g["base"][l + 1]].tolist()
+    best = max(range(len(sizes)), key=lambda j: (sizes[j], j == 0))
+    mask = int(g["masks"][g["base"][l] + best])
+    pattern = "".join(letter if mask >> p & 1 else c for p, c in enumerate(pattern))
+    idx = hm_candidates(pattern, "".join(sorted(excluded + letter)) if not mask else excluded)
+    return g["words"][int(random.choice(idx))]
+@metrics.timed("render")
 def hm_format_display(w, g): return "".join([f" {l} " if l in g else " __ " for l in w])
 
 # --- Tic-Tac-Toe Logic ---
 TTT_EMPTY, TTT_P1, TTT_P2 = "➖", "❌", "⭕"
-def ttt_check_win(b, p):
-    wins = [[(0,0),(0,1),(0,2)],[(1,0),(1,1),(1,2)],[(2,0),(2,1),(2,2)],[(0,0),(1,0),(2,0)],[(0,1),(1,1),(2,1)],[(0,2),(1,2),(2,2)],[(0,0),(1,1),(2,2)],[(0,2),(1,1),(2,0)]]
-    for w in wins:
-        if all(b[r][c] == p for r,c in w): return True
+# Boards are two 9-bit masks [X, O] with cell r*3+c at bit r*3+c. Every reachable position is solved
+# once at startup into TTT_TABLE: key x | o << 9 -> per-cell scores for the side to move (positive
+# wins, larger is faster; 0 draws; None for taken cells), so a bot reply is one dict lookup.
+TTT_LINES = (0b000000111, 0b000111000, 0b111000000, 0b001001001, 0b010010010, 0b100100100, 0b100010001, 0b001010100)
+TTT_FULL = 0b111111111
+TTT_AI_LEVELS = {"easy": 0.3, "medium": 0.7, "hard": 1.0}
+def ttt_is_win(m):
+    for line in TTT_LINES:
+        if m & line == line: return True
     return False
+def ttt_is_full(b): return b[0] | b[1] == TTT_FULL
+def ttt_cell(b, k): return TTT_P1 if b[0] >> k & 1 else TTT_P2 if b[1] >> k & 1 else TTT_EMPTY
+def ttt_build_table():
+    table = {}
+    def solve(me, opp, x_to_move):
+        key = (me | opp << 9) if x_to_move else (opp | me << 9)
+        if key in table: return max(s for s in table[key] if s is not None)
+        empty = TTT_FULL & ~(me | opp); scores = [None] * 9
+        for k in range(9):
+            if not empty >> k & 1: continue
+            m = me | 1 << k
+            if ttt_is_win(m): scores[k] = bin(empty).count("1")
+            elif m | opp == TTT_FULL: scores[k] = 0
+            else: scores[k] = -solve(opp, m, not x_to_move)
+        table[key] = tuple(scores)
+        return max(s for s in scores if s is not None)
+    solve(0, 0, True)
+    return table
+TTT_TABLE = ttt_build_table()
+def ttt_ai_move(b, level="hard"):
+    scores = TTT_TABLE[b[0] | b[1] << 9]; moves = [k for k in range(9) if scores[k] is not None]
+    best = max(scores[k] for k in moves)
+    optimal = [k for k in moves if scores[k] == best]
+    if random.random() < TTT_AI_LEVELS.get(level, 1.0) or len(optimal) == len(moves): return random.choice(optimal)
+    return random.choice([k for k in moves if scores[k] != best])
 
 # --- Anagrams Logic ---
-def get_anagram_word(d="medium"): return hm_get_random_word(d)
-def scramble_word(w):
-    s = list(w); random.shuffle(s); scrambled = "".join(s)
-    return scramble_word(w) if scrambled == w else scrambled
+def an_signature(w): return "".join(sorted(w))
+def an_solutions(w): return words.part("anagrams")["signatures"].get(an_signature(w), frozenset()) | {w}
+def an_is_solution(guess, w):
+    sig = an_signature(guess)
+    return guess == w or (sig == an_signature(w) and guess in words.part("anagrams")["signatures"].get(sig, ()))
+def get_anagram_word(d="medium", unique=True):
+    part = words.part("anagrams"); pool = part["unique"].get(d) if unique else None
+    pool = pool or part["by_length"].get(d) or part["by_length"]["medium"]
+    return random.choice(pool) if pool else "PUZZLE"
+def scramble_word(w, tries=25):
+    letters, solutions, fallback = list(w), an_solutions(w), None
+    for _ in range(tries):
+        random.shuffle(letters); scrambled = "".join(letters)
+        if scrambled in solutions: continue
+        if all(a != b for a, b in zip(scrambled, w)): return scrambled
+        fallback = fallback or scrambled
+    return fallback or w[1:] + w[:1]
 
 
 # --- Guess the Number Logic ---
 def gtn_generate_number(): return random.randint(1, 100)
 
+# --- Outbound Edits ---
+# Game interactions are acknowledged right away and the message edit is queued per channel. Each
+# channel drains through a token bucket; a newer render of the same message replaces the queued one,
+# and final (game over) renders jump the queue and are never replaced by a non-final render.
+EDIT_BURST, EDIT_WINDOW = int(os.getenv("EDIT_BURST", "5")), float(os.getenv("EDIT_WINDOW", "5.0"))
+# Edits go through the interaction's webhook (edit_original_response), so they neither need the
+# bot token's channel routes nor compete with them. The webhook adapter sleeps through 429s itself
+# and only logs them, so those are counted from its logger (interaction edits are the bot's only
+# webhook traffic); a 429 it gives up on comes back as a plain HTTPException, which _drain counts
+# and requeues instead of dropping the edit.
+class RateLimitCounter(logging.Handler):
+    def __init__(self, metrics): super().__init__(logging.WARNING); self.metrics = metrics
+    def emit(self, record):
+        if record.msg.startswith("Webhook ID %s is rate limited"): self.metrics["ratelimited"] += 1
+def retry_after(e):
+    try: return float(e.response.headers.get("Retry-After") or 1.0)
+    except (AttributeError, TypeError, ValueError): return 1.0
+class EditScheduler:
+    def __init__(self, burst=EDIT_BURST, window=EDIT_WINDOW):
+        self.burst, self.rate = burst, burst / window
+        self.buckets, self.pending, self.queues, self.workers = {}, {}, {}, {}
+        self.metrics = collections.Counter()
+        logging.getLogger("discord.webhook.async_").addHandler(RateLimitCounter(self.metrics))
+    async def edit(self, i, final=False, **kw):
+        if not i.response.is_done(): await i.response.defer()
+        self.submit(i, kw, final)
+    def submit(self, i, kw, final=False):
+        channel_id, message_id = i.channel_id, i.message.id
+        key = (channel_id, message_id); self.metrics["submitted"] += 1
+        queued = self.pending.get(key)
+        if queued:
+            if queued[2] and not final: self.metrics["superseded"] += 1; return
+            queued[:] = i, kw, final; self.metrics["coalesced"] += 1 # the newest interaction's token is the one furthest from expiring
+            if final: self.queues[channel_id].remove(message_id); self.queues[channel_id].appendleft(message_id)
+        else:
+            self.pending[key] = [i, kw, final]; q = self.queues.setdefault(channel_id, collections.deque())
+            if final: q.appendleft(message_id)
+            else: q.append(message_id)
+        if channel_id not in self.workers: self.workers[channel_id] = asyncio.create_task(self._drain(channel_id))
+    async def _take_token(self, channel_id):
+        tokens, last = self.buckets.get(channel_id, (self.burst, time.monotonic()))
+        while True:
+            now = time.monotonic(); tokens = min(self.burst, tokens + (now - last) * self.rate); last = now
+            if tokens >= 1: self.buckets[channel_id] = (tokens - 1, now); return
+            self.metrics["throttled"] += 1; await asyncio.sleep((1 - tokens) / self.rate)
+    async def _drain(self, channel_id):
+        q = self.queues[channel_id]
+        try:
+            while q:
+                await self._take_token(channel_id)
+                mid = q.popleft(); i, kw, final = self.pending.pop((channel_id, mid))
+                try: await self.send(i, kw); self.metrics["sent"] += 1
+                except discord.HTTPException as e:
+                    if e.status != 429: self.metrics["failed"] += 1; print(f"ERROR: failed to edit message {mid}: {e}"); continue
+                    self.metrics["ratelimited"] += 1
+                    if (channel_id, mid) not in self.pending: self.pending[(channel_id, mid)] = [i, kw, final]; q.appendleft(mid)
+                    await asyncio.sleep(retry_after(e))
+        finally:
+            del self.workers[channel_id]
+            if not q: del self.queues[channel_id]
+    async def send(self, i, kw): await i.edit_original_response(**kw)
+    def stats(self): return {"queue_depth": len(self.pending), "channels": len(self.workers), **self.metrics}
+scheduler = EditScheduler()
+
 # --- Discord UI Views ---
-class C4GameView(discord.ui.View):
-    def __init__(self, gs):
-        super().__init__(timeout=300); self.game_state = gs
-        for i in range(C4_COLS): self.add_item(C4ColumnButton(str(i+1), i))
-    async def interaction_check(self, i):
-        if i.user.id != self.game_state["players"][self.game_state["turn_index"]].id:
-            await i.response.send_message("It's not your turn!", ephemeral=True); return False
-        return True
-    async def handle_win(self, i, w):
-        for item in self.children: item.disabled = True
-        e = i.message.embeds[0]; e.description = f"**🎉 {w.mention} wins! 🎉**\n\n{c4_format_board(self.game_state['board'])}"; e.color = discord.Color.green()
-        await i.response.edit_message(embed=e, view=self); del active_connect_four_games[i.message.id]
-    async def handle_draw(self, i):
-        for item in self.children: item.disabled = True
-        e = i.message.embeds[0]; e.description = f"**🤝 It's a draw! 🤝**\n\n{c4_format_board(self.game_state['board'])}"; e.color = discord.Color.gold()
-        await i.response.edit_message(embed=e, view=self); del active_connect_four_games[i.message.id]
-class C4ColumnButton(discord.ui.Button):
-    def __init__(self, l, c):
-        super().__init__(style=discord.ButtonStyle.secondary, label=l); self.column = c
+# Game buttons carry "pz:<game>:<game id>:<action>" custom ids. One DynamicItem routes every click to
+# the handler registered for that game type, which looks the state up in the session registry, so no
+# View objects are kept per game and buttons keep working for as long as the session exists.
+COMPONENT_HANDLERS = {}
+def component_handler(game):
+    def register(f): COMPONENT_HANDLERS[game] = metrics.timed("component", game)(f); return f
+    return register
+class GameComponent(discord.ui.DynamicItem[discord.ui.Button], template=r"pz:(?P<game>[a-z]+):(?P<gid>[0-9]+):(?P<action>[A-Za-z0-9]+)"):
+    def __init__(self, game, gid, action, label, style=discord.ButtonStyle.secondary, row=None, disabled=False):
+        super().__init__(discord.ui.Button(label=label, style=style, disabled=disabled, custom_id=f"pz:{game}:{gid}:{action}"), row=row)
+        self.game, self.gid, self.action = game, gid, action
+    @classmethod
+    async def from_custom_id(cls, i, item, match): return cls(match["game"], int(match["gid"]), match["action"], item.label, item.style)
     async def callback(self, i):
-        gs, b = self.view.game_state, self.view.game_state["board"]
-        if not c4_is_valid_location(b, self.column): await i.response.send_message("This column is full!", ephemeral=True); return
-        r, p = c4_get_next_open_row(b, self.column), gs["pieces"][gs["turn_index"]]
-        c4_drop_piece(b, r, self.column, p)
-        if c4_check_win(b, p): await self.view.handle_win(i, i.user); return
-        if C4_EMPTY not in b: await self.view.handle_draw(i); return
-        gs["turn_index"] = 1 - gs["turn_index"]
-        e, np = i.message.embeds[0], gs["players"][gs["turn_index"]]
-        e.description = f"{c4_format_board(b)}\n\nIt's **{np.mention}'s** turn ({gs['pieces'][gs['turn_index']]})"
-        await i.response.edit_message(embed=e, view=self.view)
+        gs = sessions.get(self.gid)
+        if gs is None: await i.response.send_message("This game has expired.", ephemeral=True); return
+        await COMPONENT_HANDLERS[self.game](i, gs, self.action)
+def game_view(*items):
+    v = discord.ui.View(timeout=None)
+    for item in items: v.add_item(item)
+    return v
+def new_game(game, i, gs, users): return sessions.add(game, i.id, gs, users, i.guild_id)
+
+# Connect Four
+@metrics.timed("render")
+def c4_view(gs, done=False): return game_view(*(GameComponent("connectfour", gs["id"], str(c), str(c + 1), disabled=done) for c in range(C4_COLS)))
+async def c4_finish(i, gs, text, color, winner=None):
+    e = i.message.embeds[0]; e.description = f"{text}\n\n{c4_format_board(gs['board'])}"; e.color = color
+    sessions.remove(gs["id"]) # before the edit's await, so a click racing the final render finds the game over
+    if winner is None: record_result("connectfour", draws=gs["players"])
+    else: record_result("connectfour", wins=[winner], losses=[u for u in gs["players"] if u != winner])
+    await scheduler.edit(i, embed=e, view=c4_view(gs, done=True), final=True)
+async def c4_next_turn(i, gs):
+    gs["turn_index"] = 1 - gs["turn_index"]
+    thinking = " — thinking..." if gs.get("ai") and gs["turn_index"] == 1 else ""
+    e = i.message.embeds[0]; e.description = f"{c4_format_board(gs['board'])}\n\nIt's **<@{gs['players'][gs['turn_index']]}>'s** turn ({(C4_P1, C4_P2)[gs['turn_index']]}){thinking}"
+    await scheduler.edit(i, embed=e, view=c4_view(gs))
+@component_handler("connectfour")
+async def c4_on_click(i, gs, action):
+    if i.user.id != gs["players"][gs["turn_index"]]: await i.response.send_message("It's not your turn!", ephemeral=True); return
+    b, col = gs["board"], int(action)
+    if not b.can_play(col): await i.response.send_message("This column is full!", ephemeral=True); return
+    if b.play(col): await c4_finish(i, gs, f"**🎉 {i.user.mention} wins! 🎉**", discord.Color.green(), i.user.id); return
+    if b.is_full(): await c4_finish(i, gs, "**🤝 It's a draw! 🤝**", discord.Color.gold()); return
+    await c4_next_turn(i, gs)
+    if not gs.get("ai"): return
+    gs["message"] = [i.channel_id, i.message.id]
+    if b.play(await c4_ai_move(b, gs["ai"])): await c4_finish(i, gs, f"**🎉 <@{gs['players'][1]}> wins! 🎉**", discord.Color.green(), gs["players"][1]); return
+    if b.is_full(): await c4_finish(i, gs, "**🤝 It's a draw! 🤝**", discord.Color.gold()); return
+    await c4_next_turn(i, gs)
+    sessions.get(gs["id"]) # a flush during the search stored the board before the bot's move; mark it dirty again
+async def c4_resume_ai(gs):
+    # A restart interrupted the bot's search: finish its move so the player can click again, and
+    # redraw the message if the bot can still reach it (there is no interaction to answer).
+    b = gs["board"]; won = b.play(await c4_ai_move(b, gs["ai"]))
+    if sessions.get(gs["id"]) is None: return
+    if won or b.is_full():
+        sessions.remove(gs["id"]); color, view = discord.Color.green() if won else discord.Color.gold(), c4_view(gs, done=True)
+        if won: record_result("connectfour", wins=[gs["players"][1]], losses=[gs["players"][0]]); desc = f"**🎉 <@{gs['players'][1]}> wins! 🎉**\n\n{c4_format_board(b)}"
+        else: record_result("connectfour", draws=gs["players"]); desc = f"**🤝 It's a draw! 🤝**\n\n{c4_format_board(b)}"
+    else:
+        gs["turn_index"], color, view = 0, None, c4_view(gs)
+        desc = f"{c4_format_board(b)}\n\nIt's **<@{gs['players'][0]}>'s** turn ({C4_P1})"
+    if "message" not in gs: return
+    try:
+        m = await bot.get_partial_messageable(gs["message"][0]).fetch_message(gs["message"][1])
+        e = m.embeds[0]; e.description = desc
+        if color: e.color = color
+        await m.edit(embed=e, view=view)
+    except (discord.HTTPException, IndexError) as e: print(f"ERROR: could not redraw restored Connect Four game {gs['id']}: {e}")
 class C4ChallengeView(discord.ui.View):
     def __init__(self, ch, op):
         super().__init__(timeout=60); self.challenger, self.opponent = ch, op
@@ -153,239 +945,415 @@ class C4ChallengeView(discord.ui.View):
         if i.user.id != self.opponent.id: await i.response.send_message("This challenge is not for you.", ephemeral=True); return False
         return True
     @discord.ui.button(label="Accept", style=discord.ButtonStyle.success)
+    @metrics.timed("component", "connectfour_challenge")
     async def accept(self, i, b):
-        gs = {"board": c4_create_board(), "players": [self.challenger, self.opponent], "pieces": [C4_P1, C4_P2], "turn_index": 0}
+        if err := sessions.check_limits([self.challenger.id, self.opponent.id], i.guild_id): await i.response.send_message(err, ephemeral=True); return
+        gs = new_game("connectfour", i, {"board": c4_create_board(), "players": [self.challenger.id, self.opponent.id], "turn_index": 0}, [self.challenger.id, self.opponent.id])
         e = discord.Embed(title=f"Connect Four: {self.challenger.display_name} vs. {self.opponent.display_name}", description=f"{c4_format_board(gs['board'])}\n\nIt's **{self.challenger.mention}'s** turn ({C4_P1})", color=discord.Color.blue())
-        await i.response.edit_message(content="Challenge accepted!", embed=e, view=C4GameView(gs))
-        msg = await i.original_response(); active_connect_four_games[msg.id] = gs; self.stop()
+        await i.response.edit_message(content="Challenge accepted!", embed=e, view=c4_view(gs)); self.stop()
     @discord.ui.button(label="Decline", style=discord.ButtonStyle.danger)
+    @metrics.timed("component", "connectfour_challenge")
     async def decline(self, i, b): await i.response.edit_message(content=f"{self.opponent.mention} declined.", view=None); self.stop()
-class HangmanView(discord.ui.View):
-    def __init__(self, gs):
-        super().__init__(timeout=300); self.game_state = gs
-        for i, l in enumerate("ABCDEFGHIJKLMNOPQRSTUVWXYZ"):
-            if i // 5 >= 5: break
-            self.add_item(HangmanLetterButton(l, i // 5))
-    async def interaction_check(self, i):
-        if i.user.id != self.game_state["player"].id: await i.response.send_message("This is not your game!", ephemeral=True); return False
-        return True
-    async def update_game(self, i):
-        gs = self.game_state; wd = hm_format_display(gs["word"], gs["guessed"]); dr = HANGMAN_PICS[gs["wrong_guesses"]]
-        e = i.message.embeds[0]; e.description = f"{dr}\n\nThe word has **{len(gs['word'])}** letters.\n\n**Word:**{wd}\n\n**Guessed:** {' '.join(sorted(list(gs['guessed'])))}"
-        if " __ " not in wd:
-            e.color, e.title = discord.Color.green(), "🎉 You Win! 🎉"
-            for item in self.children: item.disabled = True
-            del active_hangman_games[i.message.id]
-        elif gs["wrong_guesses"] >= len(HANGMAN_PICS) - 1:
-            e.color, e.title = discord.Color.red(), "💀 You Lost! 💀"; e.description = f"{dr}\n\nThe word was: **{gs['word']}**"
-            for item in self.children: item.disabled = True
-            del active_hangman_games[i.message.id]
-        await i.response.edit_message(embed=e, view=self)
-class HangmanLetterButton(discord.ui.Button):
-    def __init__(self, l, r):
-        super().__init__(style=discord.ButtonStyle.secondary, label=l, row=r); self.letter = l
-    async def callback(self, i):
-        gs = self.view.game_state; self.disabled = True; gs["guessed"].add(self.letter)
-        if self.letter not in gs["word"]: gs["wrong_guesses"] += 1
-        await self.view.update_game(i)
-class WordLadderView(discord.ui.View):
-    def __init__(self, gs):
-        super().__init__(timeout=300); self.game_state = gs
-    async def interaction_check(self, i):
-        if i.user.id not in [p.id for p in self.game_state["players"]]: await i.response.send_message("This is not your game!", ephemeral=True); return False
-        return True
-    @discord.ui.button(label="Make a Move", style=discord.ButtonStyle.primary)
-    async def make_move_button(self, i, b): await i.response.send_modal(WordLadderInputModal(self.game_state))
+
+# Hangman
+@metrics.timed("render")
+def hm_view(gs, done=False):
+    keys = [GameComponent("hangman", gs["id"], l, l, row=n // 5, disabled=done or l in gs["guessed"]) for n, l in enumerate(words.part("hangman")["letters"])]
+    return game_view(*keys, GameComponent("hangman", gs["id"], "hint", "💡", discord.ButtonStyle.primary, row=len(keys) // 5, disabled=done))
+@component_handler("hangman")
+async def hm_on_click(i, gs, letter):
+    if i.user.id != gs["player"]: await i.response.send_message("This is not your game!", ephemeral=True); return
+    if letter == "hint":
+        best, hits, n = hm_hint(gs["word"], gs["guessed"])
+        if best is None: await i.response.send_message("No more hints for this one!", ephemeral=True); return
+        await i.response.send_message(f"💡 Try **{best}**: it's in {hits} of the {n} word{'s' if n != 1 else ''} that still fit.", ephemeral=True); return
+    if letter in gs["guessed"]: await i.response.send_message(f"You already guessed **{letter}**.", ephemeral=True); return
+    if gs.get("adversarial"): gs["word"] = hm_dodge(gs["word"], gs["guessed"], letter)
+    gs["guessed"].add(letter)
+    if letter not in gs["word"]: gs["wrong_guesses"] += 1
+    wd = hm_format_display(gs["word"], gs["guessed"]); dr = HANGMAN_PICS[gs["wrong_guesses"]]; done = False
+    e = i.message.embeds[0]; e.description = f"{dr}\n\nThe word has **{len(gs['word'])}** letters.\n\n**Word:**{wd}\n\n**Guessed:** {' '.join(sorted(list(gs['guessed'])))}"
+    if " __ " not in wd:
+        e.color, e.title = discord.Color.green(), "🎉 You Win! 🎉"; done = True
+    elif gs["wrong_guesses"] >= len(HANGMAN_PICS) - 1:
+        e.color, e.title = discord.Color.red(), "💀 You Lost! 💀"; e.description = f"{dr}\n\nThe word was: **{gs['word']}**"; done = True
+    if done:
+        sessions.remove(gs["id"])
+        if " __ " not in wd: record_result("hangman", wins=[gs["player"]])
+        else: record_result("hangman", losses=[gs["player"]])
+    await scheduler.edit(i, embed=e, view=hm_view(gs, done), final=done)
+
+# Word Ladder
+def wl_view(gs): return game_view(GameComponent("wordladder", gs["id"], "move", "Make a Move", discord.ButtonStyle.primary))
+@component_handler("wordladder")
+async def wl_on_click(i, gs, action):
+    if i.user.id not in gs["players"]: await i.response.send_message("This is not your game!", ephemeral=True); return
+    await i.response.send_modal(WordLadderInputModal(gs["id"], len(gs["start_word"])))
 class WordLadderInputModal(discord.ui.Modal, title="Submit Your Next Word"):
-    def __init__(self, gs):
-        super().__init__(); self.game_state = gs
-        self.next_word = discord.ui.TextInput(label="Your Word", placeholder="Enter the next word...", min_length=len(gs["start_word"]), max_length=len(gs["start_word"]))
+    def __init__(self, gid, n):
+        super().__init__(); self.gid = gid
+        self.next_word = discord.ui.TextInput(label="Your Word", placeholder="Enter the next word...", min_length=n, max_length=n)
         self.add_item(self.next_word)
+    @metrics.timed("modal", "wordladder")
     async def on_submit(self, i):
-        pi = 0 if len(self.game_state["players"]) == 1 or i.user.id == self.game_state["players"][0].id else 1
-        pl, cw, nwi = self.game_state["ladders"][pi], self.game_state["ladders"][pi][-1], self.next_word.value.upper()
-        if not wl_is_valid_move(cw, nwi, self.game_state["difficulty"]): await i.response.send_message(f"'{nwi}' is not a valid move from '{cw}'.", ephemeral=True); return
+        gs = sessions.get(self.gid)
+        if gs is None: await i.response.send_message("This game has expired.", ephemeral=True); return
+        pi = 0 if len(gs["players"]) == 1 or i.user.id == gs["players"][0] else 1
+        pl, cw, nwi = gs["ladders"][pi], gs["ladders"][pi][-1], self.next_word.value.upper()
+        if not wl_is_valid_move(cw, nwi, gs["difficulty"]): await i.response.send_message(f"'{nwi}' is not a valid move from '{cw}'.", ephemeral=True); return
         pl.append(nwi)
         e = i.message.embeds[0]
-        if len(self.game_state["players"]) == 1:
-            e.description = f"**Goal:** `{self.game_state['start_word']}` → `{self.game_state['end_word']}`\n\n**Your Ladder ({len(pl) - 1} points):**\n{wl_format_ladder(pl)}"
+        if len(gs["players"]) == 1:
+            left = await asyncio.to_thread(wl_remaining, nwi, gs["end_word"], gs["difficulty"]) if nwi != gs["end_word"] else 0 # the win below must not wait
+            e.description = f"{wl_format_goal(gs)}\n\n**Your Ladder ({len(pl) - 1} points):**\n{wl_format_ladder(pl)}" + (f"\n\nShortest remaining: **{left}** moves" if left else "")
         else:
-            p1, p2 = self.game_state["players"][0], self.game_state["players"][1]
-            e.description = f"**Goal:** `{self.game_state['start_word']}` → `{self.game_state['end_word']}`\n\n**{p1.display_name}'s Ladder ({len(self.game_state['ladders'][0]) - 1} points):**\n{wl_format_ladder(self.game_state['ladders'][0])}\n\n**{p2.display_name}'s Ladder ({len(self.game_state['ladders'][1]) - 1} points):**\n{wl_format_ladder(self.game_state['ladders'][1])}"
-        if nwi == self.game_state["end_word"]:
+            p1n, p2n = gs["names"]
+            e.description = f"{wl_format_goal(gs)}\n\n**{p1n}'s Ladder ({len(gs['ladders'][0]) - 1} points):**\n{wl_format_ladder(gs['ladders'][0])}\n\n**{p2n}'s Ladder ({len(gs['ladders'][1]) - 1} points):**\n{wl_format_ladder(gs['ladders'][1])}"
+        if nwi == gs["end_word"]:
             e.title = f"🎉 {i.user.display_name} Wins! 🎉"; e.color = discord.Color.green()
-            await i.response.edit_message(embed=e, view=None); del active_word_ladder_games[i.message.id]
-        else: await i.response.edit_message(embed=e)
+            sessions.remove(gs["id"]); record_result("wordladder", wins=[i.user.id], losses=[u for u in gs["players"] if u != i.user.id])
+            await scheduler.edit(i, embed=e, view=None, final=True)
+        else: await scheduler.edit(i, embed=e)
 class WLChallengeView(discord.ui.View):
     def __init__(self, ch, op, d):
         super().__init__(timeout=60); self.challenger, self.opponent, self.difficulty = ch, op, d
     @discord.ui.button(label="Accept", style=discord.ButtonStyle.success)
+    @metrics.timed("component", "wordladder_challenge")
     async def accept(self, i, b):
-        s, e = wl_get_word_pair()
-        gs = {"players": [self.challenger, self.opponent], "start_word": s, "end_word": e, "ladders": [[s], [s]], "difficulty": self.difficulty}
+        if err := sessions.check_limits([self.challenger.id, self.opponent.id], i.guild_id): await i.response.send_message(err, ephemeral=True); return
+        await words.load("ladder"); s, e, par = await asyncio.to_thread(wl_get_word_pair, self.difficulty)
         p1n, p2n = self.challenger.display_name, self.opponent.display_name
-        em = discord.Embed(title=f"Word Ladder: {p1n} vs. {p2n}", color=discord.Color.blue(), description=f"**Goal:** `{s}` → `{e}`\n\n**{p1n}'s Ladder (0 points):**\n{wl_format_ladder([s])}\n\n**{p2n}'s Ladder (0 points):**\n{wl_format_ladder([s])}")
-        await i.response.edit_message(content="Challenge accepted!", embed=em, view=WordLadderView(gs))
-        msg = await i.original_response(); active_word_ladder_games[msg.id] = gs; self.stop()
+        gs = new_game("wordladder", i, {"players": [self.challenger.id, self.opponent.id], "names": [p1n, p2n], "start_word": s, "end_word": e, "par": par, "ladders": [[s], [s]], "difficulty": self.difficulty}, [self.challenger.id, self.opponent.id])
+        em = discord.Embed(title=f"Word Ladder: {p1n} vs. {p2n}", color=discord.Color.blue(), description=f"{wl_format_goal(gs)}\n\n**{p1n}'s Ladder (0 points):**\n{wl_format_ladder([s])}\n\n**{p2n}'s Ladder (0 points):**\n{wl_format_ladder([s])}")
+        await i.response.edit_message(content="Challenge accepted!", embed=em, view=wl_view(gs)); self.stop()
     @discord.ui.button(label="Decline", style=discord.ButtonStyle.danger)
+    @metrics.timed("component", "wordladder_challenge")
     async def decline(self, i, b): await i.response.edit_message(content=f"{self.opponent.mention} declined.", view=None); self.stop()
-class TTTGameView(discord.ui.View):
-    def __init__(self, gs):
-        super().__init__(timeout=300); self.game_state = gs
-        for r in range(3):
-            for c in range(3): self.add_item(TTTSquareButton(r, c))
-    async def interaction_check(self, i):
-        if i.user.id != self.game_state["players"][self.game_state["turn_index"]].id: await i.response.send_message("It's not your turn!", ephemeral=True); return False
-        return True
-    async def handle_win(self, i, w):
-        for item in self.children: item.disabled = True
-        e = i.message.embeds[0]; e.description = f"**🎉 {w.mention} wins! 🎉**"; e.color = discord.Color.green()
-        await i.response.edit_message(embed=e, view=self); del active_tictactoe_games[i.message.id]
-    async def handle_draw(self, i):
-        for item in self.children: item.disabled = True
-        e = i.message.embeds[0]; e.description = "**🤝 It's a draw! 🤝**"; e.color = discord.Color.gold()
-        await i.response.edit_message(embed=e, view=self); del active_tictactoe_games[i.message.id]
-class TTTSquareButton(discord.ui.Button):
-    def __init__(self, r, c):
-        super().__init__(style=discord.ButtonStyle.secondary, label="\u200b", row=r); self.row, self.col = r, c
-    async def callback(self, i):
-        gs = self.view.game_state; pp = gs["pieces"][gs["turn_index"]]
-        gs["board"][self.row][self.col] = pp; self.label = pp; self.style = discord.ButtonStyle.success if pp == TTT_P1 else discord.ButtonStyle.danger; self.disabled = True
-        if ttt_check_win(gs["board"], pp): await self.view.handle_win(i, i.user); return
-        if all(cell != TTT_EMPTY for row in gs["board"] for cell in row): await self.view.handle_draw(i); return
-        gs["turn_index"] = 1 - gs["turn_index"]
-        e, np = i.message.embeds[0], gs["players"][gs["turn_index"]]
-        e.description = f"It's **{np.mention}'s** turn ({gs['pieces'][gs['turn_index']]})"
-        await i.response.edit_message(embed=e, view=self.view)
+
+# Tic-Tac-Toe
+TTT_STYLES = {TTT_P1: discord.ButtonStyle.success, TTT_P2: discord.ButtonStyle.danger}
+@metrics.timed("render")
+def ttt_view(gs, done=False):
+    cells = [ttt_cell(gs["board"], k) for k in range(9)]
+    return game_view(*(GameComponent("tictactoe", gs["id"], str(k), "\u200b" if cell == TTT_EMPTY else cell, TTT_STYLES.get(cell, discord.ButtonStyle.secondary), row=k // 3, disabled=done or cell != TTT_EMPTY) for k, cell in enumerate(cells)))
+async def ttt_finish(i, gs, text, color, winner=None):
+    e = i.message.embeds[0]; e.description = text; e.color = color
+    sessions.remove(gs["id"])
+    if winner is None: record_result("tictactoe", draws=gs["players"])
+    else: record_result("tictactoe", wins=[winner], losses=[u for u in gs["players"] if u != winner])
+    await scheduler.edit(i, embed=e, view=ttt_view(gs, done=True), final=True)
+@component_handler("tictactoe")
+async def ttt_on_click(i, gs, action):
+    if i.user.id != gs["players"][gs["turn_index"]]: await i.response.send_message("It's not your turn!", ephemeral=True); return
+    b, k = gs["board"], int(action)
+    if (b[0] | b[1]) >> k & 1: await i.response.send_message("That square is taken!", ephemeral=True); return
+    if gs.get("ai"):
+        b[0] |= 1 << k
+        if ttt_is_win(b[0]): await ttt_finish(i, gs, f"**🎉 {i.user.mention} wins! 🎉**", discord.Color.green(), i.user.id); return
+        if ttt_is_full(b): await ttt_finish(i, gs, "**🤝 It's a draw! 🤝**", discord.Color.gold()); return
+        b[1] |= 1 << ttt_ai_move(b, gs["ai"])
+        if ttt_is_win(b[1]): await ttt_finish(i, gs, f"**🎉 <@{gs['players'][1]}> wins! 🎉**", discord.Color.green(), gs["players"][1]); return
+        if ttt_is_full(b): await ttt_finish(i, gs, "**🤝 It's a draw! 🤝**", discord.Color.gold()); return
+        e = i.message.embeds[0]; e.description = f"It's **{i.user.mention}'s** turn ({TTT_P1})"
+        await scheduler.edit(i, embed=e, view=ttt_view(gs)); return
+    t = gs["turn_index"]; b[t] |= 1 << k
+    if ttt_is_win(b[t]): await ttt_finish(i, gs, f"**🎉 {i.user.mention} wins! 🎉**", discord.Color.green(), i.user.id); return
+    if ttt_is_full(b): await ttt_finish(i, gs, "**🤝 It's a draw! 🤝**", discord.Color.gold()); return
+    gs["turn_index"] = 1 - t
+    e = i.message.embeds[0]; e.description = f"It's **<@{gs['players'][gs['turn_index']]}>'s** turn ({(TTT_P1, TTT_P2)[gs['turn_index']]})"
+    await scheduler.edit(i, embed=e, view=ttt_view(gs))
 class TTTChallengeView(discord.ui.View):
     def __init__(self, ch, op):
         super().__init__(timeout=60); self.challenger, self.opponent = ch, op
     @discord.ui.button(label="Accept", style=discord.ButtonStyle.success)
+    @metrics.timed("component", "tictactoe_challenge")
     async def accept(self, i, b):
-        gs = {"board": [[TTT_EMPTY for _ in range(3)] for _ in range(3)], "players": [self.challenger, self.opponent], "pieces": [TTT_P1, TTT_P2], "turn_index": 0}
+        if err := sessions.check_limits([self.challenger.id, self.opponent.id], i.guild_id): await i.response.send_message(err, ephemeral=True); return
+        gs = new_game("tictactoe", i, {"board": [0, 0], "players": [self.challenger.id, self.opponent.id], "turn_index": 0}, [self.challenger.id, self.opponent.id])
         e = discord.Embed(title=f"Tic-Tac-Toe: {self.challenger.display_name} vs {self.opponent.display_name}", description=f"It's **{self.challenger.mention}'s** turn ({TTT_P1})", color=discord.Color.blue())
-        await i.response.edit_message(content="Challenge accepted!", embed=e, view=TTTGameView(gs))
-        msg = await i.original_response(); active_tictactoe_games[msg.id] = gs; self.stop()
+        await i.response.edit_message(content="Challenge accepted!", embed=e, view=ttt_view(gs)); self.stop()
     @discord.ui.button(label="Decline", style=discord.ButtonStyle.danger)
+    @metrics.timed("component", "tictactoe_challenge")
     async def decline(self, i, b): await i.response.edit_message(content=f"{self.opponent.mention} declined.", view=None); self.stop()
-class AnagramView(discord.ui.View):
-    def __init__(self, gs):
-        super().__init__(timeout=120); self.game_state = gs
-    @discord.ui.button(label="Guess the Word", style=discord.ButtonStyle.primary)
-    async def guess_button(self, i, b): await i.response.send_modal(AnagramInputModal(self.game_state, self))
+
+# Anagrams
+def ana_view(gs, done=False): return game_view(GameComponent("anagram", gs["id"], "guess", "Guess the Word", discord.ButtonStyle.primary, disabled=done))
+@component_handler("anagram")
+async def ana_on_click(i, gs, action): await i.response.send_modal(AnagramInputModal(gs["id"]))
 class AnagramInputModal(discord.ui.Modal, title="Unscramble the Word"):
-    def __init__(self, gs, pv):
-        super().__init__(); self.game_state, self.parent_view = gs, pv
+    def __init__(self, gid):
+        super().__init__(); self.gid = gid
         self.guess_input = discord.ui.TextInput(label="Your Guess", placeholder="Type the unscrambled word here...")
         self.add_item(self.guess_input)
+    @metrics.timed("modal", "anagram")
     async def on_submit(self, i):
-        guess = self.guess_input.value.upper(); cw = self.game_state["word"]
-        if guess == cw:
-            e = i.message.embeds[0]; e.title = f"🎉 {i.user.display_name} Solved It! 🎉"
-            e.description = f"The scrambled word was `{self.game_state['scrambled']}`.\n\nThe correct word was **{cw}**!"
-            e.color = discord.Color.green()
-            for item in self.parent_view.children: item.disabled = True
-            await i.response.edit_message(embed=e, view=self.parent_view); del active_anagram_games[i.message.id]
-        else: await i.response.send_message(f"Sorry, '{guess}' is not the correct word. Try again!", ephemeral=True)
-class GuessTheNumberView(discord.ui.View):
-    def __init__(self, gs):
-        super().__init__(timeout=180); self.game_state = gs
-    @discord.ui.button(label="Make a Guess", style=discord.ButtonStyle.primary)
-    async def make_guess_button(self, i, b): await i.response.send_modal(GuessTheNumberInputModal(self.game_state))
+        # Everything from the lookup to sessions.remove runs without awaiting, so when many players
+        # submit at once exactly one correct guess claims the win and the rest see the game as ended.
+        guess, gs = self.guess_input.value.strip().upper(), sessions.get(self.gid)
+        if gs is None: await i.response.send_message("Too late, this game has already ended!", ephemeral=True); return
+        if not an_is_solution(guess, gs["word"]): await i.response.send_message(f"Sorry, '{guess}' is not the correct word. Try again!", ephemeral=True); return
+        sessions.remove(gs["id"]); record_result("anagram", wins=[i.user.id])
+        others = sorted(an_solutions(gs["word"]) - {guess})
+        e = i.message.embeds[0]; e.title = f"🎉 {i.user.display_name} Solved It! 🎉"
+        e.description = f"The scrambled word was `{gs['scrambled']}`.\n\nThe correct word was **{guess}**!" + (f"\n\nAlso accepted: {', '.join(others)}" if others else "")
+        e.color = discord.Color.green()
+        await scheduler.edit(i, embed=e, view=ana_view(gs, done=True), final=True)
+
+# Guess the Number
+def gtn_view(gs): return game_view(GameComponent("guessthenumber", gs["id"], "guess", "Make a Guess", discord.ButtonStyle.primary))
+@component_handler("guessthenumber")
+async def gtn_on_click(i, gs, action): await i.response.send_modal(GuessTheNumberInputModal(gs["id"]))
 class GuessTheNumberInputModal(discord.ui.Modal, title="Guess The Number"):
-    def __init__(self, gs):
-        super().__init__(); self.game_state = gs
+    def __init__(self, gid):
+        super().__init__(); self.gid = gid
         self.guess_input = discord.ui.TextInput(label="Your Guess (1-100)", placeholder="Enter a number...")
         self.add_item(self.guess_input)
+    @metrics.timed("modal", "guessthenumber")
     async def on_submit(self, i):
+        gs = sessions.get(self.gid)
+        if gs is None: await i.response.send_message("This game has expired.", ephemeral=True); return
         if not self.guess_input.value.isdigit(): await i.response.send_message("That's not a valid number!", ephemeral=True); return
-        guess = int(self.guess_input.value); gs = self.game_state; gs["guesses"] += 1; e = i.message.embeds[0]
+        guess = int(self.guess_input.value); gs["guesses"] += 1; e = i.message.embeds[0]
         if guess == gs["number"]:
             e.title = f"🎉 You Guessed It! 🎉"; e.color = discord.Color.green(); e.description = f"You guessed the number **{gs['number']}** in {gs['guesses']} guesses!"
-            await i.response.edit_message(embed=e, view=None); del active_guess_the_number_games[i.message.id]
+            sessions.remove(gs["id"]); record_result("guessthenumber", wins=[gs["player"]])
+            await scheduler.edit(i, embed=e, view=None, final=True)
         else:
             hint = "Higher ⬆️" if guess < gs["number"] else "Lower ⬇️"
             e.description = f"Your last guess was `{guess}`. The number is **{hint}**"
-            await i.response.edit_message(embed=e)
+            await scheduler.edit(i, embed=e)
 
 # --- Bot Commands ---
+@tasks.loop(seconds=30)
+async def sweep_sessions(): sessions.sweep(); sessions.memory_bytes = sessions.memory_estimate()
+
+@bot.event
+async def on_ready():
+    print(f'{bot.user} has connected to Discord! (worker {WORKER}, shards {sorted(bot.shards)} of {bot.shard_count})')
+    if not sweep_sessions.is_running(): sweep_sessions.start()
+@bot.event
+async def on_shard_connect(shard_id): metrics.gateway["connect", shard_id] += 1
 @bot.event
-async def on_ready(): print(f'{bot.user} has connected to Discord!'); await bot.tree.sync()
+async def on_shard_disconnect(shard_id): metrics.gateway["disconnect", shard_id] += 1
+@bot.event
+async def on_shard_resumed(shard_id): metrics.gateway["resume", shard_id] += 1
 
 @bot.tree.command(name="ping", description="Check the bot's latency.")
+@metrics.timed("command", "ping")
 async def ping_command(interaction: discord.Interaction):
     latency = round(bot.latency * 1000) # Latency in milliseconds
     await interaction.response.send_message(embed=discord.Embed(
         title="🏓 Pong!",
-        description=f"My latency is **{latency}ms**.",
+        description=f"My latency is **{latency}ms**.\nActive games: **{len(sessions)}**\nQueued edits: **{len(scheduler.pending)}**\nEvent loop lag: **{metrics.loop_lag * 1000:.1f}ms**",
         color=discord.Color.blue() # Or your theme color
     ))
 
 
-@bot.tree.command(name="connectfour", description="Challenge a player to Connect Four.")
-async def connectfour(i, o: discord.Member):
-    if o.bot or o.id == i.user.id: return await i.response.send_message("Invalid opponent.", ephemeral=True)
-    await i.response.send_message(f"**Connect Four Challenge!**\n\n{i.user.mention} has challenged {o.mention}.", view=C4ChallengeView(i.user, o))
+@bot.tree.command(name="connectfour", description="Challenge a player to Connect Four, or play against the bot.")
+@app_commands.describe(opponent="The user you want to challenge (leave empty to play the bot).", difficulty="How strong the bot plays in a solo game.")
+@app_commands.choices(difficulty=[app_commands.Choice(name="Easy", value="easy"), app_commands.Choice(name="Medium", value="medium"), app_commands.Choice(name="Hard", value="hard")])
+@metrics.timed("command", "connectfour")
+async def connectfour(i, opponent: discord.Member = None, difficulty: str = "medium"):
+    if opponent is None:
+        if err := sessions.check_limits([i.user.id], i.guild_id): return await i.response.send_message(err, ephemeral=True)
+        gs = new_game("connectfour", i, {"board": c4_create_board(), "players": [i.user.id, i.client.user.id], "turn_index": 0, "ai": difficulty}, [i.user.id])
+        e = discord.Embed(title=f"Connect Four: {i.user.display_name} vs. the Bot ({difficulty.title()})", description=f"{c4_format_board(gs['board'])}\n\nIt's **{i.user.mention}'s** turn ({C4_P1})", color=discord.Color.blue())
+        return await i.response.send_message(embed=e, view=c4_view(gs))
+    if opponent.bot or opponent.id == i.user.id: return await i.response.send_message("Invalid opponent.", ephemeral=True)
+    await i.response.send_message(f"**Connect Four Challenge!**\n\n{i.user.mention} has challenged {opponent.mention}.", view=C4ChallengeView(i.user, opponent))
 
 @bot.tree.command(name="hangman", description="Start a game of Hangman.")
-@app_commands.describe(difficulty="How long should the word be?")
-@app_commands.choices(difficulty=[app_commands.Choice(name="Easy (3-4 letters)", value="easy"), app_commands.Choice(name="Medium (5-6 letters)", value="medium"), app_commands.Choice(name="Hard (7+ letters)", value="hard")])
-async def hangman(interaction: discord.Interaction, difficulty: str = "medium"):
+@app_commands.describe(difficulty="How hard should the word be to guess?", adversarial="Let the bot keep switching words to dodge your guesses.")
+@app_commands.choices(difficulty=[app_commands.Choice(name="Easy", value="easy"), app_commands.Choice(name="Medium", value="medium"), app_commands.Choice(name="Hard", value="hard")])
+@metrics.timed("command", "hangman")
+async def hangman(interaction: discord.Interaction, difficulty: str = "medium", adversarial: bool = False):
+    if err := sessions.check_limits([interaction.user.id], interaction.guild_id): return await interaction.response.send_message(err, ephemeral=True)
+    await words.load("hangman")
     word = hm_get_random_word(difficulty)
-    gs = {"word": word, "guessed": set(), "wrong_guesses": 0, "player": interaction.user}
-    e = discord.Embed(title=f"Hangman ({difficulty.title()})", description=f"{HANGMAN_PICS[0]}\n\nThe word has **{len(word)}** letters.\n\n**Word:**{hm_format_display(word, set())}\n\n**Guessed:** (None yet)", color=discord.Color.blue())
-    await interaction.response.send_message(embed=e, view=HangmanView(gs))
-    msg = await interaction.original_response(); active_hangman_games[msg.id] = gs
+    gs = new_game("hangman", interaction, {"word": word, "guessed": set(), "wrong_guesses": 0, "player": interaction.user.id, "adversarial": adversarial}, [interaction.user.id])
+    e = discord.Embed(title=f"Hangman ({difficulty.title()}{', Adversarial' if adversarial else ''})", description=f"{HANGMAN_PICS[0]}\n\nThe word has **{len(word)}** letters.\n\n**Word:**{hm_format_display(word, set())}\n\n**Guessed:** (None yet)", color=discord.Color.blue())
+    await interaction.response.send_message(embed=e, view=hm_view(gs))
 
 @bot.tree.command(name="wordladder", description="Start a game of Word Ladder.")
 @app_commands.describe(difficulty="Set the game difficulty.", opponent="The user you want to race (optional).")
 @app_commands.choices(difficulty=[app_commands.Choice(name="Easy (1 or 2 letter changes)", value="easy"), app_commands.Choice(name="Hard (1 letter change only)", value="hard")])
+@metrics.timed("command", "wordladder")
 async def wordladder(interaction: discord.Interaction, difficulty: str, opponent: discord.Member = None):
     if opponent:
         if opponent.bot or opponent.id == interaction.user.id: return await interaction.response.send_message("Invalid opponent.", ephemeral=True)
         await interaction.response.send_message(f"**Word Ladder Challenge!**\n\n{interaction.user.mention} has challenged {opponent.mention} to a race.", view=WLChallengeView(interaction.user, opponent, difficulty))
     else:
-        s, e = wl_get_word_pair(); gs = {"players": [interaction.user], "start_word": s, "end_word": e, "ladders": [[s]], "difficulty": difficulty}
-        em = discord.Embed(title=f"Word Ladder ({difficulty.title()})", color=discord.Color.blue(), description=f"**Goal:** `{s}` → `{e}`\n\n**Your Ladder (0 points):**\n{wl_format_ladder([s])}")
-        await interaction.response.send_message(embed=em, view=WordLadderView(gs))
-        msg = await interaction.original_response(); active_word_ladder_games[msg.id] = gs
+        if err := sessions.check_limits([interaction.user.id], interaction.guild_id): return await interaction.response.send_message(err, ephemeral=True)
+        await words.load("ladder"); s, e, par = await asyncio.to_thread(wl_get_word_pair, difficulty); gs = new_game("wordladder", interaction, {"players": [interaction.user.id], "start_word": s, "end_word": e, "par": par, "ladders": [[s]], "difficulty": difficulty}, [interaction.user.id])
+        em = discord.Embed(title=f"Word Ladder ({difficulty.title()})", color=discord.Color.blue(), description=f"{wl_format_goal(gs)}\n\n**Your Ladder (0 points):**\n{wl_format_ladder([s])}")
+        await interaction.response.send_message(embed=em, view=wl_view(gs))
 
-@bot.tree.command(name="tictactoe", description="Challenge a player to Tic-Tac-Toe.")
-async def tictactoe(interaction: discord.Interaction, opponent: discord.Member):
+@bot.tree.command(name="tictactoe", description="Challenge a player to Tic-Tac-Toe, or play against the bot.")
+@app_commands.describe(opponent="The user you want to challenge (leave empty to play the bot).", difficulty="How well the bot plays in a solo game.")
+@app_commands.choices(difficulty=[app_commands.Choice(name="Easy", value="easy"), app_commands.Choice(name="Medium", value="medium"), app_commands.Choice(name="Hard (perfect play)", value="hard")])
+@metrics.timed("command", "tictactoe")
+async def tictactoe(interaction: discord.Interaction, opponent: discord.Member = None, difficulty: str = "hard"):
+    if opponent is None:
+        if err := sessions.check_limits([interaction.user.id], interaction.guild_id): return await interaction.response.send_message(err, ephemeral=True)
+        gs = new_game("tictactoe", interaction, {"board": [0, 0], "players": [interaction.user.id, interaction.client.user.id], "turn_index": 0, "ai": difficulty}, [interaction.user.id])
+        e = discord.Embed(title=f"Tic-Tac-Toe: {interaction.user.display_name} vs the Bot ({difficulty.title()})", description=f"It's **{interaction.user.mention}'s** turn ({TTT_P1})", color=discord.Color.blue())
+        return await interaction.response.send_message(embed=e, view=ttt_view(gs))
     if opponent.bot or opponent.id == interaction.user.id: return await interaction.response.send_message("Invalid opponent.", ephemeral=True)
     await interaction.response.send_message(f"**Tic-Tac-Toe Challenge!**\n\n{interaction.user.mention} has challenged {opponent.mention}.", view=TTTChallengeView(interaction.user, opponent))
 
 @bot.tree.command(name="anagram", description="Starts a word scramble game.")
 @app_commands.describe(difficulty="How long should the word be?")
 @app_commands.choices(difficulty=[app_commands.Choice(name="Easy (3-4 letters)", value="easy"), app_commands.Choice(name="Medium (5-6 letters)", value="medium"), app_commands.Choice(name="Hard (7+ letters)", value="hard")])
+@metrics.timed("command", "anagram")
 async def anagram(interaction: discord.Interaction, difficulty: str = "medium"):
+    if err := sessions.check_limits([interaction.user.id], interaction.guild_id): return await interaction.response.send_message(err, ephemeral=True)
+    await words.load("anagrams")
     word = get_anagram_word(difficulty)
     scrambled = scramble_word(word)
-    gs = {"word": word, "scrambled": scrambled}
+    gs = new_game("anagram", interaction, {"word": word, "scrambled": scrambled}, [interaction.user.id])
     e = discord.Embed(title=" unscramble the word!", description=f"The first person to unscramble this word wins:\n\n# `{scrambled}`", color=discord.Color.blurple())
     e.set_footer(text=f"Difficulty: {difficulty.title()}")
-    await interaction.response.send_message(embed=e, view=AnagramView(gs))
-    msg = await interaction.original_response(); active_anagram_games[msg.id] = gs
+    await interaction.response.send_message(embed=e, view=ana_view(gs))
 
 
 @bot.tree.command(name="guessthenumber", description="Start a game of Guess the Number.")
+@metrics.timed("command", "guessthenumber")
 async def guessthenumber(i):
-    gs = {"number": gtn_generate_number(), "guesses": 0, "player": i.user}
+    if err := sessions.check_limits([i.user.id], i.guild_id): return await i.response.send_message(err, ephemeral=True)
+    gs = new_game("guessthenumber", i, {"number": gtn_generate_number(), "guesses": 0, "player": i.user.id}, [i.user.id])
     e = discord.Embed(title="Guess the Number (1-100)", description="I'm thinking of a number between 1 and 100. What's your first guess?", color=discord.Color.teal())
-    await i.response.send_message(embed=e, view=GuessTheNumberView(gs))
-    msg = await i.original_response(); active_guess_the_number_games[msg.id] = gs
+    await i.response.send_message(embed=e, view=gtn_view(gs))
+
+@bot.tree.command(name="leaderboard", description="Show the players with the most wins.")
+@app_commands.describe(game="Only count wins in one game (optional).")
+@app_commands.choices(game=[app_commands.Choice(name="Connect Four", value="connectfour"), app_commands.Choice(name="Hangman", value="hangman"), app_commands.Choice(name="Word Ladder", value="wordladder"), app_commands.Choice(name="Tic-Tac-Toe", value="tictactoe"), app_commands.Choice(name="Anagrams", value="anagram"), app_commands.Choice(name="Guess the Number", value="guessthenumber")])
+@metrics.timed("command", "leaderboard")
+async def leaderboard(i, game: str = None):
+    if not store: return await i.response.send_message("Stats are not enabled on this bot.", ephemeral=True)
+    rows = await store.leaderboard(game)
+    lines = [f"**{n}.** <@{u}> — {w} W / {l} L / {d} D" for n, (u, w, l, d) in enumerate(rows, 1)]
+    e = discord.Embed(title="🏆 Leaderboard" + (f" ({game})" if game else ""), description="\n".join(lines) or "No games recorded yet.", color=discord.Color.gold())
+    await i.response.send_message(embed=e)
+
+# Operator commands act on the whole process and every guild it serves, so they are limited to the
+# application's owner (or team members) and PUZZLES_OPERATOR_IDS; default_permissions only keeps
+# them out of regular members' command lists.
+OPERATOR_IDS = frozenset(int(u) for u in os.getenv("PUZZLES_OPERATOR_IDS", "").split(",") if u.strip())
+async def is_operator(i): return i.user.id in OPERATOR_IDS or await bot.is_owner(i.user)
+
+@bot.tree.command(name="reloadwords", description="Reload the word lists from disk (bot operators only).")
+@app_commands.default_permissions(administrator=True)
+@app_commands.guild_only()
+@metrics.timed("command", "reloadwords")
+async def reloadwords(i):
+    if not await is_operator(i): return await i.response.send_message("This command is only for the bot's operators.", ephemeral=True)
+    if SUPERVISOR_PID:
+        os.kill(SUPERVISOR_PID, signal.SIGHUP)
+        return await i.response.send_message(f"Asked the supervisor to reload `{words.path}` in every worker; each one swaps the new index in once it is built.", ephemeral=True)
+    await i.response.defer(ephemeral=True, thinking=True)
+    t = time.perf_counter(); new = await reload_words()
+    await i.followup.send(f"Reloaded `{new.path}` (index `{new.digest}`, parts: {', '.join(new.parts) or 'none'}) in {time.perf_counter() - t:.2f}s.", ephemeral=True)
+
+@bot.tree.command(name="stats", description="Show handler latency and runtime metrics (bot operators only).")
+@app_commands.default_permissions(administrator=True)
+@app_commands.guild_only()
+@metrics.timed("command", "stats")
+async def stats(i):
+    if not await is_operator(i): return await i.response.send_message("This command is only for the bot's operators.", ephemeral=True)
+    def table(family, unit=1000, suffix="ms", limit=8):
+        rows = sorted(((label, h) for (fam, label), h in metrics.histograms.items() if fam == family and h.n), key=lambda item: -item[1].n)[:limit]
+        return "\n".join(f"`{label}` ×{h.n}: p50 {h.quantile(0.5) * unit:.2f} / p95 {h.quantile(0.95) * unit:.2f} / p99 {h.quantile(0.99) * unit:.2f}{suffix}" for label, h in rows) or "No data yet."
+    lag = metrics.histograms["loop", None]
+    e = discord.Embed(title="📈 Bot Stats", color=discord.Color.blue())
+    e.add_field(name="Games", value="\n".join(f"{g}: **{c}**" for g, c in sessions.counts().items()) + f"\nTotal: **{len(sessions)}** (~{sessions.memory_estimate() // 1024} KiB)", inline=True)
+    e.add_field(name="Runtime", value=f"Worker **{WORKER}**, shards **{', '.join(map(str, sorted(bot.shards))) or '-'}** of **{bot.shard_count or 1}**\nGateway: **{bot.latency * 1000:.0f}ms**, reconnects: **{metrics.reconnects()}**\nLoop lag: **{metrics.loop_lag * 1000:.1f}ms** (p99 {lag.quantile(0.99) * 1000:.1f}ms)\nQueued edits: **{len(scheduler.pending)}**\nHandler errors: **{sum(metrics.errors.values())}**\nProfiler: **{'running' if metrics.profiler else 'off'}**\nFirst interaction: **{f'{metrics.cold_start:.2f}s' if metrics.cold_start is not None else '-'}** after start", inline=True)
+    e.add_field(name="Commands", value=table("command"), inline=False)
+    e.add_field(name="Buttons", value=table("component"), inline=False)
+    e.add_field(name="Modals", value=table("modal"), inline=False)
+    e.add_field(name="Rendering", value=table("render", 1_000_000, "µs"), inline=False)
+    await i.response.send_message(embed=e, ephemeral=True)
+
+@bot.tree.command(name="profile", description="Start or stop the sampling profiler (bot operators only).")
+@app_commands.describe(action="Start sampling, or stop and get the results.")
+@app_commands.choices(action=[app_commands.Choice(name="Start", value="start"), app_commands.Choice(name="Stop", value="stop")])
+@app_commands.default_permissions(administrator=True)
+@app_commands.guild_only()
+@metrics.timed("command", "profile")
+async def profile(i, action: str):
+    if not await is_operator(i): return await i.response.send_message("This command is only for the bot's operators.", ephemeral=True)
+    if action == "start":
+        if metrics.profiler: return await i.response.send_message("The profiler is already running.", ephemeral=True)
+        metrics.profiler = SamplingProfiler(threading.get_ident()).start()
+        return await i.response.send_message(f"Sampling {f'worker {WORKER} (the one serving this server)' if SUPERVISOR_PID else 'the event loop'} every {PROFILER_INTERVAL * 1000:g}ms. Use `/profile stop` to get the results.", ephemeral=True)
+    if not metrics.profiler: return await i.response.send_message("The profiler is not running.", ephemeral=True)
+    p, metrics.profiler = metrics.profiler.stop(), None
+    own, total = p.top()
+    lines = [f"Samples: **{p.samples}** over {time.monotonic() - p.started:.1f}s", "**Self time:**"] + [f"`{100 * c / max(p.samples, 1):5.1f}%` {f}" for f, c in own] + ["**Including callees:**"] + [f"`{100 * c / max(p.samples, 1):5.1f}%` {f}" for f, c in total]
+    await i.response.send_message("\n".join(lines)[:2000], file=discord.File(io.BytesIO(p.collapsed().encode()), filename="profile.folded"), ephemeral=True)
 
 @bot.tree.command(name="help", description="Shows the rules for the games.")
+@metrics.timed("command", "help")
 async def help(i):
     e = discord.Embed(title="Puzzles Bot Help", description="Here's how to play the available games:", color=discord.Color.purple())
-    e.add_field(name="🔴 Connect Four 🟡", value="**Objective:** Be the first to get four discs in a row.\n**How to Play:** Use `/connectfour @user` to challenge someone.", inline=False)
-    e.add_field(name="💀 Hangman 💀", value="**Objective:** Guess the secret word before the hangman is drawn.\n**How to Play:** Use `/hangman` and choose a difficulty to start a solo game.", inline=False)
+    e.add_field(name="🔴 Connect Four 🟡", value="**Objective:** Be the first to get four discs in a row.\n**How to Play:** Use `/connectfour @user` to challenge someone, or `/connectfour` alone to play the bot.", inline=False)
+    e.add_field(name="💀 Hangman 💀", value="**Objective:** Guess the secret word before the hangman is drawn.\n**How to Play:** Use `/hangman` and choose a difficulty to start a solo game. Press 💡 for a hint, or turn on `adversarial` for a bot that keeps changing its word.", inline=False)
     e.add_field(name="🪜 Word Ladder 🪜", value="**Objective:** Turn the start word into the end word by changing letters.\n**How to Play:** Use `/wordladder` to play solo or add an `@user` to race.", inline=False)
-    e.add_field(name="⚔️ Tic-Tac-Toe ⚔️", value="**Objective:** Be the first to get three of your marks in a row.\n**How to Play:** Use `/tictactoe @user` to challenge someone.", inline=False)
+    e.add_field(name="⚔️ Tic-Tac-Toe ⚔️", value="**Objective:** Be the first to get three of your marks in a row.\n**How to Play:** Use `/tictactoe @user` to challenge someone, or `/tictactoe` alone to play the bot.", inline=False)
     e.add_field(name=" unscramble the word! Anagrams ", value="**Objective:** Be the first to unscramble the jumbled word.\n**How to Play:** Use `/anagram` and choose a difficulty to start a game for the channel.", inline=False)
     e.add_field(name="🔢 Guess the Number 🔢", value="**Objective:** Guess the secret number between 1 and 100.\n**How to Play:** Use `/guessthenumber` to start. The bot will tell you if your guess is higher or lower.", inline=False)
+    e.add_field(name="🏆 Leaderboard 🏆", value="Use `/leaderboard` to see who has won the most games.", inline=False)
     await i.response.send_message(embed=e, ephemeral=True)
 
+# --- Command Sync ---
+# Commands are synced once per process from setup_hook (worker 0 only) rather than on every
+# on_ready. Each command's payload is hashed into a manifest under WORD_CACHE_DIR, so a restart
+# with an unchanged tree makes no API calls and an edited tree uploads or deletes only the commands
+# that differ. SYNC_GUILD_ID syncs a copy of the tree to one guild instead, which Discord applies
+# immediately (for staging). Without a manifest, or with PUZZLES_FORCE_SYNC, the whole tree is synced.
+SYNC_GUILD_ID = int(os.getenv("SYNC_GUILD_ID", "0")) or None
+FORCE_SYNC = os.getenv("PUZZLES_FORCE_SYNC", "") not in ("", "0")
+def command_hashes(guild=None):
+    return {c.name: hashlib.sha256(json.dumps(c.to_dict(bot.tree), sort_keys=True).encode()).hexdigest()[:16] for c in bot.tree.get_commands(guild=guild)}
+def command_manifest_path(guild=None): return os.path.join(WORD_CACHE_DIR, f"commands-{bot.application_id}-{guild.id if guild else 'global'}.json")
+def write_command_manifest(path, manifest):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True); tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f: json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp, path)
+    except OSError as e: print(f"ERROR: could not write command manifest {path}: {e}")
+async def sync_commands(force=FORCE_SYNC):
+    guild = discord.Object(SYNC_GUILD_ID) if SYNC_GUILD_ID else None
+    if guild: bot.tree.copy_global_to(guild=guild)
+    path, hashes, t = command_manifest_path(guild), command_hashes(guild), time.perf_counter()
+    scope = f"guild {guild.id}" if guild else "global"
+    # Bulk syncs hit a tight per-application limit that discord.py raises instead of waiting out
+    # (max_ratelimit_timeout), so wait and retry; the manifest keeps whatever already went through.
+    while True:
+        try:
+            with open(path) as f: manifest = json.load(f)
+        except (OSError, json.JSONDecodeError): manifest = None
+        try:
+            if manifest is not None and not force:
+                changed = [c for c in bot.tree.get_commands(guild=guild) if manifest.get(c.name, {}).get("hash") != hashes[c.name]]
+                removed = [name for name in manifest if name not in hashes]
+                if not changed and not removed: print(f"Commands ({scope}) unchanged since last sync, skipping"); return
+                try:
+                    for c in changed:
+                        payload = c.to_dict(bot.tree)
+                        data = await (bot.http.upsert_guild_command(bot.application_id, guild.id, payload) if guild else bot.http.upsert_global_command(bot.application_id, payload))
+                        manifest[c.name] = {"hash": hashes[c.name], "id": int(data["id"])}
+                    for name in removed:
+                        cid = manifest.pop(name)["id"]
+                        await (bot.http.delete_guild_command(bot.application_id, guild.id, cid) if guild else bot.http.delete_global_command(bot.application_id, cid))
+                    print(f"Synced {len(changed)} changed and {len(removed)} removed commands ({scope}) in {time.perf_counter() - t:.2f}s"); return
+                except discord.NotFound: print(f"Command manifest {path} is stale, doing a full sync")
+                finally: write_command_manifest(path, manifest)
+            synced = await bot.tree.sync(guild=guild)
+            write_command_manifest(path, {c.name: {"hash": hashes[c.name], "id": c.id} for c in synced if c.name in hashes})
+            print(f"Synced all {len(synced)} commands ({scope}) in {time.perf_counter() - t:.2f}s"); return
+        except discord.RateLimited as e: print(f"Command sync ({scope}) rate limited, retrying in {e.retry_after:.0f}s"); await asyncio.sleep(e.retry_after)
+        except discord.HTTPException as e: print(f"ERROR: failed to sync commands ({scope}): {e}"); return
+
 # --- Run the Bot ---
 if __name__ == '__main__':
     if TOKEN: bot.run(TOKEN)
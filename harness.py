@@ -0,0 +1,210 @@
+# --- Headless load harness ---
+# Drives simulated games of every type through the real command callbacks, button dispatcher and
+# modals using stand-in Interaction/Message objects, then prints a JSON report (latency percentiles,
+# event-loop lag, net retained memory blocks per move, peak RSS) that can be diffed between commits.
+# Usage: python harness.py [--games N] [--mix hangman=1,connectfour=1,...] [--out report.json]
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+os.environ.setdefault("PUZZLES_DB", "")
+import discord
+with contextlib.redirect_stdout(sys.stderr): import bot # keep stdout clean for the JSON report
+
+GAME_TYPES = ("connectfour", "hangman", "wordladder", "tictactoe", "anagram", "guessthenumber")
+_ids = itertools.count(1 << 60)
+
+# --- Stand-ins ---
+class FakeUser:
+    def __init__(self, uid): self.id, self.mention, self.display_name, self.bot = uid, f"<@{uid}>", f"player{uid}", False
+class FakeMessage:
+    def __init__(self, channel_id, embed=None, view=None, content=None):
+        self.id, self.channel_id, self.content = next(_ids), channel_id, content
+        self.embeds, self.view = [embed] if embed else [], view
+    def apply(self, kw):
+        if kw.get("embed") is not None: self.embeds = [kw["embed"]]
+        if "view" in kw: self.view = kw["view"]
+        if "content" in kw: self.content = kw["content"]
+class FakeResponse:
+    def __init__(self, i): self.i, self.done, self.modal = i, False, None
+    def is_done(self): return self.done
+    def _respond(self):
+        if self.done: raise discord.InteractionResponded(self.i)
+        self.done = True
+    async def defer(self, **kw): self._respond()
+    async def send_message(self, content=None, embed=None, view=None, ephemeral=False, **kw):
+        self._respond()
+        if ephemeral: self.i.ephemeral.append(content)
+        else: self.i.message = self.i.harness.post(self.i.channel_id, FakeMessage(self.i.channel_id, embed, view, content))
+    async def edit_message(self, **kw): self._respond(); self.i.message.apply(kw)
+    async def send_modal(self, modal): self._respond(); self.modal = modal
+class FakeFollowup:
+    def __init__(self, i): self.i = i
+    async def send(self, content=None, **kw): self.i.ephemeral.append(content)
+class FakeInteraction:
+    def __init__(self, harness, user, channel_id, guild_id, message=None):
+        self.harness, self.id, self.user, self.channel_id, self.guild_id, self.message = harness, next(_ids), user, channel_id, guild_id, message
+        self.client, self.ephemeral = harness.client, []
+        self.response, self.followup = FakeResponse(self), FakeFollowup(self)
+    async def original_response(self): return self.message
+    async def edit_original_response(self, **kw): self.message.apply(kw)
+
+# --- Harness ---
+def percentiles(xs, ps=(50, 95, 99)):
+    if not xs: return {}
+    xs = sorted(xs)
+    out = {f"p{p}": round(xs[min(len(xs) - 1, int(len(xs) * p / 100))], 4) for p in ps}
+    out["max"] = round(xs[-1], 4); out["mean"] = round(sum(xs) / len(xs), 4)
+    return out
+class Harness:
+    def __init__(self, think=0.0, seed=0):
+        self.think, self.rng = think, random.Random(seed)
+        self.client = type("Client", (), {"user": FakeUser(1)})()
+        self.messages, self.latencies, self.lag = {}, {g: [] for g in GAME_TYPES}, []
+        self.moves, self.finished, self.errors, self.retained_blocks = 0, {g: 0 for g in GAME_TYPES}, [], 0
+    def post(self, channel_id, message): self.messages[message.id] = message; return message
+    async def timed(self, game, coro):
+        t = time.perf_counter()
+        await coro
+        self.latencies[game].append((time.perf_counter() - t) * 1000); self.moves += 1
+    def interaction(self, user, channel_id, guild_id, message=None): return FakeInteraction(self, user, channel_id, guild_id, message)
+    async def command(self, game, command, user, channel_id, guild_id, *args):
+        i = self.interaction(user, channel_id, guild_id)
+        await self.timed(game, command.callback(i, *args))
+        return i
+    async def click(self, game, gid, action, user, message, guild_id):
+        match = bot.GameComponent.__discord_ui_compiled_template__.fullmatch(f"pz:{game}:{gid}:{action}")
+        item = await bot.GameComponent.from_custom_id(None, discord.ui.Button(label=action, custom_id=match.string), match)
+        i = self.interaction(user, message.channel_id, guild_id, message)
+        await self.timed(game, item.callback(i))
+        return i
+    async def submit(self, game, modal, field, value, user, message, guild_id):
+        getattr(modal, field)._value = value
+        i = self.interaction(user, message.channel_id, guild_id, message)
+        await self.timed(game, modal.on_submit(i))
+        return i
+    async def pause(self): await asyncio.sleep(self.rng.uniform(0, self.think) if self.think else 0)
+    def alive(self, gid): return gid in bot.sessions.sessions
+
+    # Game scripts, one coroutine per simulated game.
+    async def accept(self, game, i, opponent, guild):
+        a = self.interaction(opponent, i.channel_id, guild, i.message)
+        await self.timed(game, i.message.view.children[0].callback(a))
+        return a.id
+    async def play_connectfour(self, n, users, ch, guild):
+        i = await self.command("connectfour", bot.connectfour, users[0], ch, guild, users[1])
+        gid = await self.accept("connectfour", i, users[1], guild)
+        while self.alive(gid):
+            gs = bot.sessions.sessions[gid].state; b = gs["board"]
+            col = self.rng.choice([c for c in range(bot.C4_COLS) if b.can_play(c)])
+            await self.click("connectfour", gid, str(col), users[gs["turn_index"]], i.message, guild); await self.pause()
+    async def play_tictactoe(self, n, users, ch, guild):
+        if n % 2: i = await self.command("tictactoe", bot.tictactoe, users[0], ch, guild, None, self.rng.choice(list(bot.TTT_AI_LEVELS))); gid = i.id
+        else: i = await self.command("tictactoe", bot.tictactoe, users[0], ch, guild, users[1]); gid = await self.accept("tictactoe", i, users[1], guild)
+        while self.alive(gid):
+            gs = bot.sessions.sessions[gid].state; b = gs["board"]
+            k = self.rng.choice([k for k in range(9) if not (b[0] | b[1]) >> k & 1])
+            await self.click("tictactoe", gid, str(k), users[gs["turn_index"]], i.message, guild); await self.pause()
+    async def play_hangman(self, n, users, ch, guild):
+        i = await self.command("hangman", bot.hangman, users[0], ch, guild, self.rng.choice(["easy", "medium", "hard"]), n % 4 == 0)
+        await self.click("hangman", i.id, "hint", users[0], i.message, guild)
+        for letter in "EAIOTNSRLHUDCMPGYBFWKVXJQZ":
+            if not self.alive(i.id): break
+            if letter in bot.words.part("hangman")["letters"]: await self.click("hangman", i.id, letter, users[0], i.message, guild); await self.pause()
+    async def play_wordladder(self, n, users, ch, guild):
+        difficulty = self.rng.choice(["easy", "hard"])
+        i = await self.command("wordladder", bot.wordladder, users[0], ch, guild, difficulty)
+        gs = bot.sessions.sessions[i.id].state
+        for word in (bot.wl_shortest_path(gs["start_word"], gs["end_word"], difficulty) or [gs["end_word"]])[1:]:
+            if not self.alive(i.id): break
+            c = await self.click("wordladder", i.id, "move", users[0], i.message, guild)
+            await self.submit("wordladder", c.response.modal, "next_word", word, users[0], i.message, guild); await self.pause()
+    async def play_anagram(self, n, users, ch, guild):
+        i = await self.command("anagram", bot.anagram, users[0], ch, guild, self.rng.choice(["easy", "medium", "hard"]))
+        word = bot.sessions.sessions[i.id].state["word"]
+        async def guesser(u):
+            for guess in ("WRONG", word[::-1], word):
+                if not self.alive(i.id): return
+                c = await self.click("anagram", i.id, "guess", u, i.message, guild)
+                if c.response.modal: await self.submit("anagram", c.response.modal, "guess_input", guess, u, i.message, guild)
+                await self.pause()
+        await asyncio.gather(*(guesser(u) for u in users))
+    async def play_guessthenumber(self, n, users, ch, guild):
+        i = await self.command("guessthenumber", bot.guessthenumber, users[0], ch, guild)
+        lo, hi = 1, 100
+        while self.alive(i.id) and lo <= hi:
+            guess, number = (lo + hi) // 2, bot.sessions.sessions[i.id].state["number"]
+            c = await self.click("guessthenumber", i.id, "guess", users[0], i.message, guild)
+            await self.submit("guessthenumber", c.response.modal, "guess_input", str(guess), users[0], i.message, guild)
+            lo, hi = (guess + 1, hi) if guess < number else (lo, guess - 1); await self.pause()
+
+    async def run_game(self, game, n):
+        players = 5 if game == "anagram" else 2
+        users = [FakeUser(1000 + n * 8 + k) for k in range(players)]
+        try:
+            await getattr(self, f"play_{game}")(n, users, 10_000 + n, 20_000 + n)
+            self.finished[game] += 1
+        except Exception as e: self.errors.append(f"{game}#{n}: {type(e).__name__}: {e}")
+    async def sample_lag(self, interval=0.01):
+        while True:
+            t = time.perf_counter(); await asyncio.sleep(interval)
+            self.lag.append((time.perf_counter() - t - interval) * 1000)
+    async def run(self, plan):
+        bot.sessions.capacity = bot.sessions.per_guild = max(bot.sessions.capacity, len(plan) * 2)
+        await asyncio.gather(*(bot.words.load(p) for p in bot.WORD_INDEX_PARTS))
+        sampler = asyncio.create_task(self.sample_lag())
+        # Games interleave, so growth in allocated blocks can only be attributed to the run as a
+        # whole: this is what the run kept alive, not how much it allocated.
+        blocks, t = sys.getallocatedblocks(), time.perf_counter()
+        await asyncio.gather(*(self.run_game(game, n) for n, game in enumerate(plan)))
+        while bot.scheduler.workers: await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - t; sampler.cancel(); self.retained_blocks = sys.getallocatedblocks() - blocks
+        return elapsed
+
+def git_revision():
+    try: return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError): return None
+def build_plan(games, mix, seed):
+    weights = {g: 1.0 for g in GAME_TYPES}
+    if mix: weights = {g: float(w) for g, w in (part.split("=") for part in mix.split(","))}
+    return random.Random(seed).choices(list(weights), weights=list(weights.values()), k=games)
+def main():
+    parser = argparse.ArgumentParser(description="Headless PuzzlesBot load harness")
+    parser.add_argument("--games", type=int, default=1000); parser.add_argument("--mix", default=None, help="weights per game type, e.g. hangman=3,anagram=1")
+    parser.add_argument("--think", type=float, default=0.0, help="max random pause between moves in seconds")
+    parser.add_argument("--seed", type=int, default=0); parser.add_argument("--tracemalloc", action="store_true", help="also report traced bytes per move (slower)")
+    parser.add_argument("--out", default=None, help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+    random.seed(args.seed)
+    if args.tracemalloc: tracemalloc.start()
+    h, plan = Harness(args.think, args.seed), build_plan(args.games, args.mix, args.seed)
+    with contextlib.redirect_stdout(sys.stderr): elapsed = asyncio.run(h.run(plan))
+    all_lat = [x for xs in h.latencies.values() for x in xs]
+    report = {
+        "revision": git_revision(), "python": sys.version.split()[0], "games": args.games, "seed": args.seed, "think": args.think,
+        "elapsed_s": round(elapsed, 3), "interactions": h.moves, "interactions_per_s": round(h.moves / elapsed, 1),
+        "finished": h.finished, "errors": h.errors[:20], "error_count": len(h.errors),
+        "latency_ms": {"all": percentiles(all_lat), **{g: percentiles(xs) for g, xs in h.latencies.items() if xs}},
+        "loop_lag_ms": percentiles(h.lag),
+        "net_retained_blocks_per_move": round(h.retained_blocks / max(h.moves, 1), 2),
+        "peak_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "scheduler": bot.scheduler.stats(), "sessions": {k: v for k, v in bot.sessions.stats().items() if k != "memory_bytes"},
+    }
+    if args.tracemalloc:
+        current, peak = tracemalloc.get_traced_memory()
+        report["traced_bytes_per_move"], report["traced_peak_bytes"] = round(current / max(h.moves, 1), 1), peak
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f: f.write(text + "\n")
+    else: print(text)
+
+if __name__ == "__main__":
+    main()
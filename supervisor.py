@@ -0,0 +1,118 @@
+# --- Sharded deployment supervisor ---
+# Runs bot.py as several worker processes that each own every N-th gateway shard (and with it the
+# games of those shards' guilds), restarts workers that crash with exponential backoff, stops them
+# cleanly on Ctrl+C/SIGTERM, forwards SIGHUP (word list reload, also sent by /reloadwords) to every
+# worker, and serves all workers' /metrics as one scrape labelled by worker.
+# Usage: python supervisor.py --workers 4 [--shards 16] [--metrics-host 127.0.0.1] [--metrics-port 9100]
+import argparse
+import asyncio
+import os
+import signal
+import sys
+import time
+import aiohttp
+import aiohttp.web
+from dotenv import load_dotenv
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BOT_PATH = os.path.join(ROOT, "bot.py")
+STABLE_AFTER, MAX_BACKOFF, STOP_TIMEOUT = 60.0, 60.0, 30.0
+
+class Worker:
+    def __init__(self, index, shard_ids, shard_count, metrics_port):
+        self.index, self.shard_ids, self.shard_count, self.metrics_port = index, shard_ids, shard_count, metrics_port
+        self.proc, self.restarts, self.started = None, 0, 0.0
+    def env(self):
+        return {**os.environ, "PUZZLES_WORKER": str(self.index), "PUZZLES_SHARD_IDS": ",".join(map(str, self.shard_ids)), "PUZZLES_SHARD_COUNT": str(self.shard_count),
+                "PUZZLES_METRICS_HOST": "127.0.0.1", "PUZZLES_METRICS_PORT": str(self.metrics_port), "PUZZLES_SUPERVISOR_PID": str(os.getpid())}
+    def up(self): return self.proc is not None and self.proc.returncode is None
+    async def run(self, stopping, delay=0.0):
+        backoff = 1.0
+        if delay and not await wait_or_stop(stopping, delay): return
+        while not stopping.is_set():
+            self.proc = await asyncio.create_subprocess_exec(sys.executable, BOT_PATH, env=self.env(), cwd=ROOT); self.started = time.monotonic()
+            print(f"[supervisor] worker {self.index} started (pid {self.proc.pid}, shards {self.shard_ids} of {self.shard_count})")
+            code = await self.proc.wait()
+            if stopping.is_set(): return
+            if code == 0: print(f"[supervisor] worker {self.index} exited cleanly, not restarting"); return
+            backoff = 1.0 if time.monotonic() - self.started > STABLE_AFTER else min(backoff * 2, MAX_BACKOFF)
+            self.restarts += 1; print(f"[supervisor] worker {self.index} exited with {code}, restarting in {backoff:.0f}s")
+            if not await wait_or_stop(stopping, backoff): return
+    async def stop(self):
+        if not self.up(): return
+        self.proc.terminate()
+        try: await asyncio.wait_for(self.proc.wait(), STOP_TIMEOUT)
+        except asyncio.TimeoutError: print(f"[supervisor] worker {self.index} did not stop, killing it"); self.proc.kill(); await self.proc.wait()
+def reload_workers(workers):
+    running = [w for w in workers if w.up()]
+    for w in running: w.proc.send_signal(signal.SIGHUP)
+    print(f"[supervisor] asked {len(running)} of {len(workers)} workers to reload their word lists")
+async def wait_or_stop(stopping, seconds):
+    try: await asyncio.wait_for(stopping.wait(), seconds); return False
+    except asyncio.TimeoutError: return True
+
+# Metrics: each worker's Prometheus text gets a worker label and families are merged so every
+# "# TYPE" line appears once, followed by the supervisor's own up/restart series.
+def add_label(line, key, value):
+    head, sample = line.rsplit(" ", 1)
+    head = f'{head[:-1]},{key}="{value}"}}' if head.endswith("}") else f'{head}{{{key}="{value}"}}'
+    return f"{head} {sample}"
+def merge_metrics(texts, workers):
+    families = {}
+    for index, text in texts:
+        current = None
+        for line in text.splitlines():
+            if line.startswith("# TYPE "): current = line.split(" ")[2]; families.setdefault(current, [line])
+            elif line and not line.startswith("#") and current: families[current].append(add_label(line, "worker", index))
+    families["puzzles_supervisor_worker_up"] = ["# TYPE puzzles_supervisor_worker_up gauge"] + [f'puzzles_supervisor_worker_up{{worker="{w.index}"}} {int(w.up())}' for w in workers]
+    families["puzzles_supervisor_restarts_total"] = ["# TYPE puzzles_supervisor_restarts_total counter"] + [f'puzzles_supervisor_restarts_total{{worker="{w.index}"}} {w.restarts}' for w in workers]
+    return "\n".join(line for lines in families.values() for line in lines) + "\n"
+async def scrape(session, w):
+    if not w.up(): return None
+    try:
+        async with session.get(f"http://127.0.0.1:{w.metrics_port}/metrics", timeout=aiohttp.ClientTimeout(total=5)) as r: return await r.text()
+    except (aiohttp.ClientError, asyncio.TimeoutError): return None
+async def serve_metrics(workers, host, port):
+    session = aiohttp.ClientSession()
+    async def handle(request):
+        texts = await asyncio.gather(*(scrape(session, w) for w in workers))
+        return aiohttp.web.Response(text=merge_metrics([(w.index, t) for w, t in zip(workers, texts) if t], workers), content_type="text/plain")
+    app = aiohttp.web.Application(); app.router.add_get("/metrics", handle)
+    runner = aiohttp.web.AppRunner(app, access_log=None); await runner.setup()
+    await aiohttp.web.TCPSite(runner, host, port).start(); print(f"[supervisor] serving merged metrics on {host}:{port}")
+    return runner, session
+
+async def recommended_shards(token):
+    # Same call discord.py makes for AutoShardedBot, so the default matches a single-process run.
+    async with aiohttp.ClientSession() as session:
+        async with session.get("https://discord.com/api/v10/gateway/bot", headers={"Authorization": f"Bot {token}"}) as r:
+            r.raise_for_status(); return (await r.json())["shards"]
+async def supervise(args):
+    shard_count = args.shards or await recommended_shards(os.environ["DISCORD_BOT_TOKEN"])
+    n = min(args.workers, shard_count)
+    workers = [Worker(k, list(range(k, shard_count, n)), shard_count, args.metrics_port + 1 + k if args.metrics_port else 0) for k in range(n)]
+    stopping = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM): asyncio.get_running_loop().add_signal_handler(sig, stopping.set)
+    asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, reload_workers, workers)
+    runner, session = await serve_metrics(workers, args.metrics_host, args.metrics_port) if args.metrics_port else (None, None)
+    # Shards identify one at a time per ~5s across the whole bot, so later workers wait their turn.
+    delays = [args.stagger * sum(len(w.shard_ids) for w in workers[:k]) for k in range(n)]
+    tasks = [asyncio.create_task(w.run(stopping, d)) for w, d in zip(workers, delays)]
+    await stopping.wait(); print("[supervisor] stopping workers...")
+    await asyncio.gather(*(w.stop() for w in workers)); await asyncio.gather(*tasks)
+    if runner: await runner.cleanup(); await session.close()
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Run PuzzlesBot as several sharded worker processes")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--shards", type=int, default=None, help="total shard count (default: Discord's recommendation)")
+    parser.add_argument("--metrics-host", default="127.0.0.1", help="interface for the merged /metrics (use 0.0.0.0 to expose it)")
+    parser.add_argument("--metrics-port", type=int, default=9100, help="merged /metrics port; workers use the following ports (0 disables)")
+    parser.add_argument("--stagger", type=float, default=5.0, help="seconds to wait per shard started by earlier workers")
+    args = parser.parse_args()
+    if not args.shards and not os.getenv("DISCORD_BOT_TOKEN"): print("ERROR: DISCORD_BOT_TOKEN not found in .env file."); return
+    asyncio.run(supervise(args))
+
+if __name__ == "__main__":
+    main()